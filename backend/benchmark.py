@@ -0,0 +1,395 @@
+"""Offline benchmark for the ocr_server.py endpoints.
+
+Runs the Flask app in process against a synthetic catalogue, with lightweight stand-ins
+for YOLO and PaddleOCR, so it needs no network, GPU or model weights:
+
+    python benchmark.py --sizes 100,1000,10000 --requests 500 --concurrency 8 --output bench.json
+    python benchmark.py --sizes 100000 --endpoints recommend,food-nutrition
+    python benchmark.py --compare before.json --output after.json
+
+Each catalogue size runs in its own process (the server configures itself at import),
+reporting startup time, p50/p95/p99 latency and throughput per endpoint, and peak RSS.
+Results are written as JSON so runs from different commits can be compared.
+"""
+import argparse
+import io
+import json
+import os
+import random
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import types
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from PIL import Image
+
+ENDPOINTS = ['recommend', 'recommend-batch', 'food-nutrition', 'search-foods', 'meal-plan',
+             'detect-food', 'detect-nutrition', 'ocr']
+
+CATALOGUE_COLUMNS = [
+    'Food Name', 'Category', 'Calories', 'Carbs', 'Fats', 'Protein', 'Fiber', 'GI', 'GL',
+    'Insulin Index', 'Magnesium', 'Potassium', 'Sodium', 'Calcium', 'Iron', 'Vitamin D',
+    'Vitamin C', 'Folate', 'Vegan/Vegetarian', 'Processed Level', 'recommendation',
+    'prepration_method', 'portion_guidance'
+]
+
+_NAME_WORDS = ['Masala', 'Paneer', 'Dal', 'Aloo', 'Palak', 'Chana', 'Rajma', 'Moong', 'Rava',
+               'Jeera', 'Methi', 'Gobi', 'Bhindi', 'Matar', 'Kadai', 'Tandoori', 'Dahi', 'Besan']
+_NAME_DISHES = ['Dosa', 'Idli', 'Curry', 'Pulao', 'Paratha', 'Chilla', 'Tikki', 'Halwa', 'Ladoo',
+                'Lassi', 'Chaat', 'Sabzi', 'Khichdi', 'Upma', 'Poha', 'Kheer', 'Sherbet', 'Vada']
+_CATEGORIES = ['Breakfast', 'Lunch', 'Dinner', 'Snack', 'Beverage', 'Dessert', 'anytime']
+
+
+# ---------- Synthetic Catalogue ----------
+
+def generate_catalogue(size, path, seed=0):
+    """Write a synthetic catalogue CSV with `size` foods and the real dataset's columns."""
+    import pandas as pd
+    rng = np.random.default_rng(seed)
+
+    names = [
+        f"{_NAME_WORDS[i % len(_NAME_WORDS)]} {_NAME_DISHES[(i // len(_NAME_WORDS)) % len(_NAME_DISHES)]} {i}"
+        for i in range(size)
+    ]
+    # Roughly 40% pass the diabetes-friendly filter, like the shipped dataset
+    friendly = rng.random(size) < 0.4
+    df = pd.DataFrame({
+        'Food Name': names,
+        'Category': rng.choice(_CATEGORIES, size),
+        'Calories': rng.integers(20, 600, size),
+        'Carbs': rng.uniform(0, 90, size).round(1),
+        'Fats': np.where(friendly, rng.uniform(0, 10, size), rng.uniform(0, 40, size)).round(1),
+        'Protein': rng.uniform(0, 30, size).round(1),
+        'Fiber': rng.uniform(0, 12, size).round(1),
+        'GI': np.where(friendly, rng.integers(15, 56, size), rng.integers(15, 95, size)),
+        'GL': np.where(friendly, rng.uniform(1, 10, size), rng.uniform(1, 40, size)).round(1),
+        'Insulin Index': rng.uniform(10, 100, size).round(1),
+        'Magnesium': rng.integers(0, 150, size),
+        'Potassium': rng.integers(0, 800, size),
+        'Sodium': rng.integers(0, 1200, size),
+        'Calcium': rng.integers(0, 300, size),
+        'Iron': rng.uniform(0, 8, size).round(1),
+        'Vitamin D': rng.uniform(0, 5, size).round(1),
+        'Vitamin C': rng.uniform(0, 60, size).round(1),
+        'Folate': rng.integers(0, 200, size),
+        'Vegan/Vegetarian': rng.choice(['Vegan', 'Vegetarian', 'Non-Vegetarian'], size),
+        'Processed Level': np.where(friendly, 'minimally processed',
+                                    rng.choice(['minimally processed', 'processed', 'ultra processed'], size)),
+        'recommendation': np.where(friendly, 'ideal_diabetic_food',
+                                   rng.choice(['suitable_for_controlled_diabetes', 'avoid', 'limit'], size)),
+        'prepration_method': rng.choice(['steamed', 'boiled', 'stir_fried', 'deep_fried', 'baked'], size),
+        'portion_guidance': rng.choice(['moderate_portion', 'regular_portion', 'small_portion'], size),
+    }, columns=CATALOGUE_COLUMNS)
+    df.to_csv(path, index=False)
+    return names
+
+
+# ---------- Stand-in Models ----------
+
+class _Tensor:
+    """Just enough of a torch tensor for the server: iteration, item(), tolist(), cpu().numpy()."""
+
+    def __init__(self, values):
+        self.values = np.asarray(values)
+
+    def __iter__(self):
+        return (_Tensor(value) for value in self.values)
+
+    def __len__(self):
+        return len(self.values)
+
+    def item(self):
+        return self.values.item()
+
+    def tolist(self):
+        return self.values.tolist()
+
+    def cpu(self):
+        return self
+
+    def numpy(self):
+        return self.values
+
+
+class StandInYOLO:
+    """Stand-in for ultralytics.YOLO: deterministic detections and tunable per-image cost."""
+
+    latency_ms = 0.0
+    labels = []
+
+    def __init__(self, weights, *args, **kwargs):
+        self.names = dict(enumerate(self.labels or ['food']))
+
+    def predict(self, source, **kwargs):
+        images = source if isinstance(source, list) else [source]
+        return [self._predict_one(image) for image in images]
+
+    def _predict_one(self, image):
+        # Cheap stand-in for inference work, scaled by the input size
+        pixels = np.asarray(image.resize((64, 64)) if hasattr(image, 'resize') else image, dtype=np.float32)
+        seed = int(pixels.sum()) % 1000
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000.0)
+
+        count = 1 + seed % 3
+        width, height = getattr(image, 'size', (640, 640))
+        classes = [(seed + i) % len(self.names) for i in range(count)]
+        boxes = [[i * width / (count + 1), 0, (i + 1) * width / (count + 1), height] for i in range(count)]
+        return types.SimpleNamespace(
+            boxes=types.SimpleNamespace(
+                cls=_Tensor(classes),
+                conf=_Tensor([0.9 - 0.1 * i for i in range(count)]),
+                xyxy=_Tensor(boxes),
+                xyxyn=_Tensor(np.asarray(boxes) / [width, height, width, height])
+            ),
+            names=self.names,
+            orig_shape=(height, width)
+        )
+
+
+class StandInPaddleOCR:
+    """Stand-in for paddleocr.PaddleOCR returning a few text lines per image."""
+
+    latency_ms = 0.0
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def ocr(self, image, cls=True):
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000.0)
+        lines = max(1, np.asarray(image).shape[0] // 64)
+        return [[[[[0, 0], [1, 0], [1, 1], [0, 1]], (f"Glucose {100 + i} mg/dL", 0.95)] for i in range(lines)]]
+
+
+def install_stand_ins(labels, model_latency_ms):
+    """Register the stand-ins as the ultralytics and paddleocr modules."""
+    StandInYOLO.labels = labels
+    StandInYOLO.latency_ms = model_latency_ms
+    StandInPaddleOCR.latency_ms = model_latency_ms
+    sys.modules['ultralytics'] = types.SimpleNamespace(YOLO=StandInYOLO)
+    sys.modules['paddleocr'] = types.SimpleNamespace(PaddleOCR=StandInPaddleOCR)
+
+
+# ---------- Workload ----------
+
+def _image_bytes(index, size=(640, 480)):
+    """A distinct PNG per index, so the content-hash caches do not short-circuit inference."""
+    rng = np.random.default_rng(index)
+    pixels = rng.integers(0, 255, (size[1] // 8, size[0] // 8, 3), dtype=np.uint8)
+    image = Image.fromarray(pixels).resize(size)
+    buffer = io.BytesIO()
+    image.save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+def _make_request(endpoint, names, index, repeat_images):
+    """Return a function issuing one request against a test client."""
+    name = names[index % len(names)]
+    if endpoint == 'recommend':
+        return lambda client: client.post('/recommend', json={'food': name})
+    if endpoint == 'recommend-batch':
+        batch = [names[(index * 15 + i) % len(names)] for i in range(15)]
+        return lambda client: client.post('/recommend/batch', json={'foods': batch})
+    if endpoint == 'food-nutrition':
+        return lambda client: client.post('/food-nutrition', json={'food_name': name})
+    if endpoint == 'search-foods':
+        return lambda client: client.get('/search-foods', query_string={'q': name[:5]})
+    if endpoint == 'meal-plan':
+        targets = {'calories': 1400 + 50 * (index % 12), 'protein': 60 + index % 40, 'fiber': 25}
+        return lambda client: client.post('/meal-plan', json={'targets': targets, 'max_gl': 60})
+
+    # Images are distinct per endpoint too, so one endpoint never runs on results cached by another
+    image_index = index % 8 if repeat_images else index
+    data = _image_bytes(ENDPOINTS.index(endpoint) * 1_000_000 + image_index)
+    path = {'detect-food': '/detect-food', 'detect-nutrition': '/detect-nutrition', 'ocr': '/ocr'}[endpoint]
+    return lambda client: client.post(path, data={'file': (io.BytesIO(data), 'image.png')})
+
+
+def _percentile(values, q):
+    return float(np.percentile(values, q)) if values else 0.0
+
+
+def run_endpoint(app, endpoint, names, requests, concurrency, repeat_images):
+    """Drive one endpoint with `concurrency` threads; returns latency and throughput stats."""
+    calls = [_make_request(endpoint, names, i, repeat_images) for i in range(requests)]
+    clients = {}
+
+    def timed(call):
+        # One test client per thread, like one connection per client
+        client = clients.setdefault(threading.get_ident(), app.test_client())
+        start = time.perf_counter()
+        response = call(client)
+        elapsed = (time.perf_counter() - start) * 1000.0
+        return elapsed, response.status_code
+
+    wall_start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(timed, calls))
+    wall = time.perf_counter() - wall_start
+
+    latencies = [elapsed for elapsed, _ in results]
+    errors = sum(1 for _, status in results if status >= 500)
+    return {
+        'requests': requests,
+        'errors': errors,
+        'status_codes': {str(code): sum(1 for _, status in results if status == code)
+                         for code in sorted({status for _, status in results})},
+        'p50_ms': round(_percentile(latencies, 50), 3),
+        'p95_ms': round(_percentile(latencies, 95), 3),
+        'p99_ms': round(_percentile(latencies, 99), 3),
+        'mean_ms': round(float(np.mean(latencies)), 3),
+        'throughput_rps': round(requests / wall, 1) if wall else 0.0
+    }
+
+
+def _peak_rss_mb():
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def run_size(args):
+    """Benchmark one catalogue size in this process and print the result as JSON."""
+    workdir = tempfile.mkdtemp(prefix='bench-')
+    try:
+        catalogue_path = os.path.join(workdir, 'catalogue.csv')
+        names = generate_catalogue(args.size, catalogue_path, seed=args.seed)
+        install_stand_ins(random.Random(args.seed).sample(names, min(len(names), 20)), args.model_latency_ms)
+
+        os.environ.update({
+            'CATALOGUE_PATH': catalogue_path,
+            'CATALOGUE_CACHE_DIR': os.path.join(workdir, 'compiled') if args.compiled else '',
+            'RESULT_CACHE_DIR': '',  # A persistent cache would carry hits over between runs
+            'MODEL_LOADING': 'eager',
+        })
+        if args.no_response_cache:
+            os.environ['RESPONSE_CACHE_SIZE'] = '0'
+
+        rss_before = _peak_rss_mb()
+        start = time.perf_counter()
+        import ocr_server
+        startup_s = time.perf_counter() - start
+
+        endpoints = {}
+        for endpoint in args.endpoints:
+            endpoints[endpoint] = run_endpoint(ocr_server.app, endpoint, names, args.requests,
+                                               args.concurrency, args.repeat_images)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(json.dumps({
+        'size': args.size,
+        'startup_s': round(startup_s, 3),
+        'peak_rss_mb': _peak_rss_mb(),
+        'rss_before_import_mb': rss_before,
+        'endpoints': endpoints
+    }))
+
+
+# ---------- Orchestration ----------
+
+def _git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'],
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _child_args(args, size):
+    child = [sys.executable, os.path.abspath(__file__), '--worker', '--size', str(size),
+             '--requests', str(args.requests), '--concurrency', str(args.concurrency),
+             '--endpoints', ','.join(args.endpoints), '--seed', str(args.seed),
+             '--model-latency-ms', str(args.model_latency_ms)]
+    if args.repeat_images:
+        child.append('--repeat-images')
+    if args.no_response_cache:
+        child.append('--no-response-cache')
+    if not args.compiled:
+        child.append('--no-compiled')
+    return child
+
+
+def print_table(results):
+    print(f"{'size':>8} {'endpoint':<18} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'req/s':>9} {'errors':>7}")
+    for run in results['runs']:
+        for endpoint, stats in run['endpoints'].items():
+            print(f"{run['size']:>8} {endpoint:<18} {stats['p50_ms']:>9.2f} {stats['p95_ms']:>9.2f} "
+                  f"{stats['p99_ms']:>9.2f} {stats['throughput_rps']:>9.1f} {stats['errors']:>7}")
+        print(f"{run['size']:>8} startup {run['startup_s']:.2f}s, peak RSS {run['peak_rss_mb']} MB")
+
+
+def print_comparison(previous, results):
+    """Print p50/p95 changes against an earlier results file."""
+    earlier = {(run['size'], endpoint): stats
+               for run in previous['runs'] for endpoint, stats in run['endpoints'].items()}
+    print(f"\nCompared with {previous.get('commit') or 'previous run'}:")
+    for run in results['runs']:
+        for endpoint, stats in run['endpoints'].items():
+            before = earlier.get((run['size'], endpoint))
+            if not before:
+                continue
+            changes = []
+            for key in ('p50_ms', 'p95_ms'):
+                if before[key]:
+                    changes.append(f"{key} {100.0 * (stats[key] - before[key]) / before[key]:+.1f}%")
+            print(f"{run['size']:>8} {endpoint:<18} {'  '.join(changes)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default='100,1000,10000', help='comma-separated catalogue sizes')
+    parser.add_argument('--endpoints', default=','.join(ENDPOINTS), help='comma-separated endpoints')
+    parser.add_argument('--requests', type=int, default=300, help='requests per endpoint')
+    parser.add_argument('--concurrency', type=int, default=8, help='client threads')
+    parser.add_argument('--model-latency-ms', type=float, default=0.0, help='simulated inference time per image')
+    parser.add_argument('--repeat-images', action='store_true', help='reuse 8 images so result caches hit')
+    parser.add_argument('--no-response-cache', action='store_true', help='disable the pre-encoded response cache')
+    parser.add_argument('--no-compiled', dest='compiled', action='store_false', help='skip the compiled catalogue')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='write JSON results here')
+    parser.add_argument('--compare', help='earlier JSON results to compare against')
+    parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--size', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    args.endpoints = [endpoint for endpoint in args.endpoints.split(',') if endpoint]
+
+    unknown = set(args.endpoints) - set(ENDPOINTS)
+    if unknown:
+        parser.error(f"unknown endpoints: {', '.join(sorted(unknown))}")
+
+    if args.worker:
+        run_size(args)
+        return
+
+    results = {
+        'commit': _git_commit(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'settings': {key: getattr(args, key) for key in
+                     ('requests', 'concurrency', 'model_latency_ms', 'repeat_images', 'no_response_cache', 'compiled')},
+        'runs': []
+    }
+    here = os.path.dirname(os.path.abspath(__file__))
+    for size in [int(size) for size in args.sizes.split(',') if size]:
+        output = subprocess.check_output(_child_args(args, size), cwd=here, text=True)
+        # The server logs to stdout; the result is the last line
+        results['runs'].append(json.loads(output.strip().splitlines()[-1]))
+
+    print_table(results)
+    if args.compare:
+        with open(args.compare) as f:
+            print_comparison(json.load(f), results)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
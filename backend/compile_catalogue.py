@@ -0,0 +1,30 @@
+"""Compile the food catalogue ahead of time so ocr_server workers start by mapping it.
+
+Run from the backend directory (same CATALOGUE_* / SIMILARITY_* settings as the server):
+    python compile_catalogue.py
+"""
+import os
+import sys
+
+# Only the catalogue is needed here; skip loading YOLO and PaddleOCR
+os.environ.setdefault("MODEL_LOADING", "lazy")
+
+import ocr_server
+
+
+def main():
+    fingerprint = ocr_server.catalogue_fingerprint(ocr_server.CATALOGUE_PATH)
+    if fingerprint is None or not ocr_server.CATALOGUE_CACHE_DIR:
+        print("Nothing to compile: catalogue missing or CATALOGUE_CACHE_DIR is empty")
+        sys.exit(1)
+    
+    if ocr_server.service_data is None:
+        sys.exit(1)
+    
+    # initialize_service() already compiled a missing or stale catalogue on import
+    target = ocr_server.compile_catalogue(ocr_server.service_data, ocr_server.CATALOGUE_CACHE_DIR, fingerprint)
+    print(target)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,18 +1,169 @@
-import sys 
-from ultralytics import YOLO
-from PIL import Image
-import io
+"""Food detection with the YOLOv8 weights, usable three ways:
+
+    python detect.py < image.b64              one base64 image on stdin, prints its top label
+    python detect.py --serve                  persistent worker speaking NDJSON on stdin/stdout
+    python detect.py --batch-dir photos/      every image in a directory, one JSON line each
+
+Any mode can run on an exported CPU runtime instead of PyTorch, e.g. --backend openvino --int8
+(see yolo_runtime.py).
+
+In --serve mode each input line is a JSON object {"id": ..., "image": "<base64>"} or
+{"id": ..., "path": "<file>"} (a bare line is read as a path if it exists, else base64).
+Each output line is {"id", "labels", "confidences", "boxes", "primary_item"} or {"id", "error"},
+where boxes are [x1, y1, x2, y2] corners as fractions of the image size.
+A {"ready": true} line is written once the model has loaded.
+"""
+import sys
+import os
+import json
 import base64
+import argparse
+from collections import deque
+from itertools import islice
+from concurrent.futures import ThreadPoolExecutor
+from preprocess import prepare_image
+from yolo_runtime import BACKENDS, load_yolo
+
+YOLO_WEIGHTS = os.environ.get("YOLO_WEIGHTS", "best.pt")
+DETECT_IMAGE_SIZE = int(os.environ.get("DETECT_IMAGE_SIZE", 640))  # YOLO input size; 0 keeps full resolution
+YOLO_BACKEND = os.environ.get("YOLO_BACKEND", "pytorch")  # pytorch, onnx or openvino
+YOLO_INT8 = os.environ.get("YOLO_INT8", "0") == "1"
+YOLO_THREADS = int(os.environ.get("YOLO_THREADS", 0))  # 0 keeps the runtime default
+YOLO_CALIBRATION_DIR = os.environ.get("YOLO_CALIBRATION_DIR", "")  # sample images for INT8 calibration
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.webp', '.tif', '.tiff')
+
+def load_model(weights=YOLO_WEIGHTS, backend=YOLO_BACKEND, int8=YOLO_INT8, threads=YOLO_THREADS):
+    return load_yolo(weights, backend, int8, threads, DETECT_IMAGE_SIZE or 640, YOLO_CALIBRATION_DIR)
+
+def decode_image(data=None, path=None):
+    """Open an image from raw bytes or a file path, upright and shrunk to the model input size."""
+    return prepare_image(path if path is not None else data, DETECT_IMAGE_SIZE)
+
+def describe(result):
+    """Labels, confidences and normalized boxes for one YOLO result, most confident first."""
+    boxes = result.boxes
+    if boxes is None or len(boxes.cls) == 0:
+        return {"labels": [], "confidences": [], "boxes": [], "primary_item": None}
+    labels = [result.names[int(cls)] for cls in boxes.cls.cpu().numpy()]
+    confidences = [round(float(conf), 4) for conf in boxes.conf.cpu().numpy()]
+    corners = [[round(float(value), 4) for value in box] for box in boxes.xyxyn.cpu().numpy()]
+    return {"labels": labels, "confidences": confidences, "boxes": corners, "primary_item": labels[0]}
+
+def _parse_request(line):
+    """Turn one input line into (id, image bytes or None, path or None)."""
+    try:
+        message = json.loads(line)
+    except ValueError:
+        message = None
+
+    if isinstance(message, dict):
+        if message.get("path"):
+            return message.get("id"), None, message["path"]
+        if message.get("image"):
+            return message.get("id"), base64.b64decode(message["image"]), None
+        raise ValueError("Request needs an 'image' or 'path' field")
+
+    # Bare lines: a file path if one exists, otherwise base64 image data
+    if os.path.exists(line):
+        return None, None, line
+    return None, base64.b64decode(line), None
 
-model = YOLO("best.pt")
+def _write(message):
+    sys.stdout.write(json.dumps(message) + "\n")
+    sys.stdout.flush()
+
+def serve(model):
+    """Answer newline-delimited requests from stdin until it closes."""
+    _write({"ready": True})
+    for line in sys.stdin:
+        line = line.strip()
+        if not line:
+            continue
+
+        request_id = None
+        try:
+            request_id, data, path = _parse_request(line)
+            image = decode_image(data, path)
+            result = model.predict(image, verbose=False)[0]
+            _write({"id": request_id, **describe(result)})
+        except Exception as e:
+            _write({"id": request_id, "error": str(e)})
+
+def batch_directory(model, directory, output, batch_size, workers):
+    """Detect every image under `directory`, decoding in parallel and predicting in batches."""
+    paths = sorted(
+        os.path.join(root, name)
+        for root, _, names in os.walk(directory)
+        for name in names
+        if name.lower().endswith(IMAGE_EXTENSIONS)
+    )
+
+    def load(path):
+        try:
+            return path, decode_image(path=path), None
+        except Exception as e:
+            return path, None, str(e)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        # Decoding runs ahead of the model by a bounded window, in input order
+        pending = deque()
+        remaining = iter(paths)
+        for path in islice(remaining, workers + batch_size):
+            pending.append(pool.submit(load, path))
+
+        batch = []
+        while pending:
+            path, image, error = pending.popleft().result()
+            for next_path in islice(remaining, 1):
+                pending.append(pool.submit(load, next_path))
+            if error is not None:
+                output.write(json.dumps({"path": path, "error": error}) + "\n")
+                continue
+            batch.append((path, image))
+            if len(batch) >= batch_size:
+                _predict_batch(model, batch, output)
+                batch = []
+        if batch:
+            _predict_batch(model, batch, output)
+
+    print(f"Processed {len(paths)} images from {directory}", file=sys.stderr)
+
+def _predict_batch(model, batch, output):
+    results = model.predict([image for _, image in batch], verbose=False)
+    for (path, _), result in zip(batch, results):
+        output.write(json.dumps({"path": path, **describe(result)}) + "\n")
+    output.flush()
 
 def main():
-    image_data = base64.b64decode(sys.stdin.read())
-    image = Image.open(io.BytesIO(image_data)).convert("RGB")
-    results = model.predict(image)
-    label = results[0].names[results[0].boxes.cls[0].item()]
-    print(label)
+    parser = argparse.ArgumentParser(description="YOLOv8 food detection")
+    parser.add_argument("--serve", action="store_true", help="persistent NDJSON worker on stdin/stdout")
+    parser.add_argument("--batch-dir", help="detect every image in this directory")
+    parser.add_argument("--output", help="NDJSON output file for --batch-dir (default stdout)")
+    parser.add_argument("--batch-size", type=int, default=8, help="images per predict call in --batch-dir")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 4, help="image decoding threads")
+    parser.add_argument("--weights", default=YOLO_WEIGHTS)
+    parser.add_argument("--backend", choices=BACKENDS, default=YOLO_BACKEND, help="inference runtime")
+    parser.add_argument("--int8", action="store_true", default=YOLO_INT8, help="INT8-quantised export")
+    parser.add_argument("--threads", type=int, default=YOLO_THREADS, help="inference threads (0 = default)")
+    args = parser.parse_args()
+
+    model = load_model(args.weights, args.backend, args.int8, args.threads)
+
+    if args.serve:
+        serve(model)
+    elif args.batch_dir:
+        output = open(args.output, "w") if args.output else sys.stdout
+        try:
+            batch_directory(model, args.batch_dir, output, max(args.batch_size, 1), max(args.workers, 1))
+        finally:
+            if args.output:
+                output.close()
+    else:
+        # Single image: base64 on stdin, top label on stdout
+        image = decode_image(base64.b64decode(sys.stdin.read()))
+        result = model.predict(image, verbose=False)[0]
+        print(describe(result)["primary_item"])
 
 
 if __name__ == "__main__":
-    main
\ No newline at end of file
+    main()
@@ -0,0 +1,53 @@
+"""Production entry point for ocr_server.py (pre-fork, copy-on-write sharing).
+
+    gunicorn -c gunicorn.conf.py ocr_server:app
+
+The app is imported once in the gunicorn parent, so the YOLO and PaddleOCR weights and
+the catalogue are loaded a single time and shared copy-on-write by every forked worker.
+The catalogue's numeric arrays are memory-mapped from CATALOGUE_CACHE_DIR, so they stay
+shared even as workers touch them.
+
+MODEL_LOADING defaults to eager; 'background' is switched to eager, because a loader
+thread running in the parent at fork time would leave workers with a held model lock.
+
+Settings (environment):
+    WEB_CONCURRENCY      number of worker processes (default 2)
+    WORKER_HTTP_THREADS  request threads per worker (default 4)
+    WORKER_CPU_THREADS   torch/BLAS/OpenMP threads per worker (default cores / workers)
+    OCR_CPU_THREADS      PaddleOCR threads per worker (default WORKER_CPU_THREADS)
+    YOLO_THREADS         YOLO inference threads per worker (default WORKER_CPU_THREADS)
+    CATALOGUE_WATCH_INTERVAL  per-worker catalogue file polling in seconds (default 10);
+                         POST /admin/reload-catalogue reaches one worker, so the others
+                         pick up a changed file through this watcher
+    BIND                 listen address (default 0.0.0.0:5001)
+"""
+import gc
+import os
+
+workers = int(os.environ.get("WEB_CONCURRENCY", 2))
+threads = int(os.environ.get("WORKER_HTTP_THREADS", 4))
+worker_class = "gthread"
+bind = os.environ.get("BIND", "0.0.0.0:5001")
+timeout = 120
+preload_app = True
+
+cpu_threads = int(os.environ.get("WORKER_CPU_THREADS", max(1, (os.cpu_count() or 1) // workers)))
+
+# Must be in place before the preloaded app imports numpy, torch and paddle
+for var in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS", "NUMEXPR_NUM_THREADS"):
+    os.environ.setdefault(var, str(cpu_threads))
+os.environ.setdefault("OCR_CPU_THREADS", str(cpu_threads))
+os.environ.setdefault("YOLO_THREADS", str(cpu_threads))
+os.environ.setdefault("MODEL_LOADING", "eager")
+os.environ.setdefault("CATALOGUE_WATCH_INTERVAL", "10")
+os.environ["PREFORK_SERVER"] = "1"
+
+
+def pre_fork(server, worker):
+    # Keep the collector from touching (and so copying) every object inherited from the parent
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    import ocr_server
+    ocr_server.configure_worker(cpu_threads)
@@ -1,25 +1,779 @@
-from flask import Flask, request, jsonify
-from paddleocr import PaddleOCR
+from flask import Flask, Request, request, jsonify, g, has_request_context, stream_with_context
 import os
+import sys
+import io
+import re
+import json
+import hashlib
+import hmac
+import tempfile
+import shutil
+import time
+import threading
+import queue
+from concurrent.futures import Future, ThreadPoolExecutor, wait, FIRST_COMPLETED
+import bisect
+import difflib
+import heapq
+from collections import Counter, OrderedDict
 import pandas as pd
 from sklearn.metrics.pairwise import cosine_similarity
-from sklearn.preprocessing import StandardScaler
+from sklearn.preprocessing import StandardScaler, normalize
 from flask_cors import CORS
 import numpy as np
-from ultralytics import YOLO
 from PIL import Image
+from preprocess import prepare_image
+from yolo_runtime import load_yolo
 
 os.environ["KMP_DUPLICATE_LIB_OK"] = "TRUE"
-yolo_model = YOLO('best.pt')  # Path to your YOLOv8 weights
+
+class InMemoryRequest(Request):
+    """Request whose multipart file parts are buffered in memory, never in a temp file.
+    
+    werkzeug spools uploads over 500KB to disk by default; MAX_CONTENT_LENGTH already
+    bounds what a request can hold, so uploads go from the socket to bytes in memory.
+    """
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return io.BytesIO()
 
 app = Flask(__name__)
+app.request_class = InMemoryRequest
 CORS(app)
 app.config['MAX_CONTENT_LENGTH'] = 10 * 1024 * 1024  # Allow up to 10MB
 
-ocr = PaddleOCR(use_angle_cls=True, lang="en")
+# Model loading: 'eager' loads every model before serving, 'background' loads them
+# in a thread while routes are already served, 'lazy' loads each one on first use
+MODEL_LOADING = os.environ.get("MODEL_LOADING", "eager")
+MODEL_WARMUP = os.environ.get("MODEL_WARMUP", "1") == "1"  # Run a dummy inference after loading
+PRELOAD_MODELS = [name.strip() for name in os.environ.get("PRELOAD_MODELS", "yolo,ocr").split(",") if name.strip()]
+OCR_CPU_THREADS = int(os.environ.get("OCR_CPU_THREADS", 10))  # PaddleOCR inference threads
+
+# Set by gunicorn.conf.py: models and catalogue load in the parent, and per-process
+# work (warm-up, thread limits, background threads) runs in each forked worker
+PREFORK_SERVER = os.environ.get("PREFORK_SERVER", "0") == "1"
+
+# A loader thread in the pre-fork parent can be mid-load, holding a model lock, when
+# a worker is forked, and that worker's first get_model would then never return
+if PREFORK_SERVER and MODEL_LOADING == 'background':
+    print("MODEL_LOADING=background is not supported under a pre-fork server; loading eagerly")
+    MODEL_LOADING = 'eager'
+YOLO_WEIGHTS = os.environ.get("YOLO_WEIGHTS", "best.pt")  # Path to your YOLOv8 weights
+
+# YOLO inference runtime: 'pytorch' runs the weights directly; 'onnx' (ONNX Runtime) and
+# 'openvino' run a CPU-optimised export built from them on first load (see yolo_runtime.py).
+# YOLO_INT8 selects the INT8-quantised export, calibrated on the images in
+# YOLO_CALIBRATION_DIR. YOLO_THREADS caps inference threads (0 = runtime default).
+YOLO_BACKEND = os.environ.get("YOLO_BACKEND", "pytorch")
+YOLO_INT8 = os.environ.get("YOLO_INT8", "0") == "1"
+YOLO_THREADS = int(os.environ.get("YOLO_THREADS", 0))
+YOLO_CALIBRATION_DIR = os.environ.get("YOLO_CALIBRATION_DIR", "")
+
+# /detect-food micro-batching: requests arriving within the window are run as one
+# batched predict call of at most this many images (1 disables batching)
+DETECT_BATCH_MAX_SIZE = int(os.environ.get("DETECT_BATCH_MAX_SIZE", 8))
+DETECT_BATCH_WINDOW_MS = float(os.environ.get("DETECT_BATCH_WINDOW_MS", 10))
+
+# Number of PaddleOCR instances, i.e. OCR jobs that can run in parallel
+OCR_WORKERS = int(os.environ.get("OCR_WORKERS", 1))
+
+# Image pre-processing: uploads are EXIF-rotated and shrunk (JPEGs decoded at reduced
+# resolution) until the longest side fits these sizes; 0 keeps full resolution. The OCR
+# defaults can be overridden per request with the grayscale, contrast and angle_cls fields.
+DETECT_IMAGE_SIZE = int(os.environ.get("DETECT_IMAGE_SIZE", 640))  # YOLO input size
+OCR_IMAGE_MAX_SIDE = int(os.environ.get("OCR_IMAGE_MAX_SIDE", 2000))
+OCR_GRAYSCALE = os.environ.get("OCR_GRAYSCALE", "0") == "1"
+OCR_CONTRAST = os.environ.get("OCR_CONTRAST", "0") == "1"
+OCR_ANGLE_CLS = os.environ.get("OCR_ANGLE_CLS", "1") == "1"
+
+# Multi-page /ocr uploads (PDF, multi-frame TIFF): pages OCR'd at once per document
+# (this also bounds how many rendered pages are in memory), PDF render resolution,
+# and the page limit per document
+OCR_PAGE_CONCURRENCY = int(os.environ.get("OCR_PAGE_CONCURRENCY", max(OCR_WORKERS, 1)))
+OCR_PDF_DPI = int(os.environ.get("OCR_PDF_DPI", 200))
+OCR_MAX_PAGES = int(os.environ.get("OCR_MAX_PAGES", 50))
+
+# Detection/OCR result cache keyed by image content: in-memory LRU entries, plus an
+# optional on-disk tier (set RESULT_CACHE_DIR) that survives restarts
+RESULT_CACHE_SIZE = int(os.environ.get("RESULT_CACHE_SIZE", 512))
+RESULT_CACHE_DIR = os.environ.get("RESULT_CACHE_DIR", "")
+RESULT_CACHE_DISK_MAX = int(os.environ.get("RESULT_CACHE_DISK_MAX", 10000))
+
+# Pre-encoded /recommend and /food-nutrition responses, and how long clients may
+# reuse them before revalidating with If-None-Match
+RESPONSE_CACHE_SIZE = int(os.environ.get("RESPONSE_CACHE_SIZE", 4096))
+RESPONSE_CACHE_MAX_AGE = int(os.environ.get("RESPONSE_CACHE_MAX_AGE", 300))
+
+# Per-stage latency histograms served at /metrics (Prometheus text format), and an
+# optional Server-Timing header with each request's stage breakdown
+METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "1") == "1"
+TIMING_HEADER = os.environ.get("TIMING_HEADER", "0") == "1"
+METRICS_BUCKETS = [0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0]
+
+# Food catalogue source, and where its compiled (memory-mappable) form is kept.
+# An empty CATALOGUE_CACHE_DIR disables compilation.
+CATALOGUE_PATH = os.environ.get("CATALOGUE_PATH", "Indian_Foods_Dataset_With_Tags_Final.csv")
+CATALOGUE_CACHE_DIR = os.environ.get("CATALOGUE_CACHE_DIR", "catalogue_cache")
+CATALOGUE_FORMAT_VERSION = 5  # Bump when the compiled layout changes
+
+# Hot reload: POST /admin/reload-catalogue needs ADMIN_TOKEN in the X-Admin-Token header
+# (the endpoint is disabled without it); a positive CATALOGUE_WATCH_INTERVAL also polls
+# the catalogue file every that many seconds and reloads it when it changes. Under a
+# pre-fork server the admin request reaches a single worker, so it requires the watcher,
+# which brings every other worker onto the new file within one interval
+ADMIN_TOKEN = os.environ.get("ADMIN_TOKEN", "")
+CATALOGUE_WATCH_INTERVAL = float(os.environ.get("CATALOGUE_WATCH_INTERVAL", 0))
+
+# Category groups; recommendations never cross a group boundary
+FOOD_GROUPS = ['beverage', 'dessert', 'snack', 'main']
+
+# Features used for similarity calculation
+SIMILARITY_FEATURES = ['Calories', 'Carbs', 'Fats', 'Protein', 'Fiber', 'GI', 'GL', 'Insulin Index']
+
+# Similarity build mode: 'topk' keeps a compact neighbour table per food,
+# 'dense' keeps the full n x n similarity matrix per category group
+SIMILARITY_MODE = os.environ.get("SIMILARITY_MODE", "topk")
+SIMILARITY_TOP_K = int(os.environ.get("SIMILARITY_TOP_K", 20))
+SIMILARITY_BLOCK_SIZE = int(os.environ.get("SIMILARITY_BLOCK_SIZE", 512))
+
+# Foods returned per recommendation; the top-K tables must hold at least this many
+RECOMMENDATION_COUNT = 5
+if SIMILARITY_TOP_K < RECOMMENDATION_COUNT:
+    raise ValueError(f"SIMILARITY_TOP_K must be at least {RECOMMENDATION_COUNT}, "
+                     f"the number of foods returned per recommendation; got {SIMILARITY_TOP_K}")
+
+# Upper bound on the number of foods accepted by /recommend/batch
+MAX_BATCH_FOODS = int(os.environ.get("MAX_BATCH_FOODS", 100))
+
+# Minimum confidence for a typo-tolerant name match to stand in for an exact one
+FUZZY_MATCH_THRESHOLD = float(os.environ.get("FUZZY_MATCH_THRESHOLD", 0.8))
+FUZZY_CANDIDATES = 10  # Trigram candidates rescored with edit similarity
+
+# Per-user constraints accepted by /recommend: a diet, plus caps and floors on catalogue
+# columns. Each distinct constraint set resolves to a cached candidate mask.
+CONSTRAINT_DIETS = ['vegan', 'vegetarian']
+CONSTRAINT_LIMITS = {
+    'max_sodium': ('Sodium', 'max'),
+    'max_gl': ('GL', 'max'),
+    'max_gi': ('GI', 'max'),
+    'max_calories': ('Calories', 'max'),
+    'max_carbs': ('Carbs', 'max'),
+    'max_fats': ('Fats', 'max'),
+    'min_protein': ('Protein', 'min'),
+    'min_fiber': ('Fiber', 'min')
+}
+CANDIDATE_CACHE_SIZE = int(os.environ.get("CANDIDATE_CACHE_SIZE", 1024))
+
+# /meal-plan: the default day as (slot, category group, preferred Category, share of the
+# daily targets), portion sizes tried per food, per-slot shortlist size for the search,
+# and the default and maximum search time budgets
+MEAL_PLAN_SLOTS = [
+    ('breakfast', 'main', 'Breakfast', 0.25),
+    ('lunch', 'main', 'Lunch', 0.30),
+    ('snack', 'snack', None, 0.10),
+    ('dinner', 'main', 'Dinner', 0.25),
+    ('beverage', 'beverage', None, 0.05),
+    ('dessert', 'dessert', None, 0.05)
+]
+MEAL_PLAN_NUTRIENTS = {'calories': 'Calories', 'protein': 'Protein', 'carbs': 'Carbs', 'fats': 'Fats', 'fiber': 'Fiber'}
+MEAL_PLAN_PORTIONS = [1.0, 1.5, 2.0]
+MEAL_PLAN_CANDIDATES = int(os.environ.get("MEAL_PLAN_CANDIDATES", 25))
+MEAL_PLAN_TOLERANCE = 1e-6  # Objective gains below this (about a 0.1% miss) are not searched for
+MEAL_PLAN_BUDGET_MS = float(os.environ.get("MEAL_PLAN_BUDGET_MS", 250))
+MEAL_PLAN_MAX_BUDGET_MS = float(os.environ.get("MEAL_PLAN_MAX_BUDGET_MS", 900))
+
+# Plate analysis: each detected item's portion is its box area relative to the largest
+# box in the photo (the largest counts as one serving), clipped and rounded to a step
+PLATE_PORTION_MIN = float(os.environ.get("PLATE_PORTION_MIN", 0.25))
+PLATE_PORTION_STEP = 0.25
+PLATE_NUTRIENTS = {'calories': 'Calories', 'carbs': 'Carbs', 'protein': 'Protein', 'fat': 'Fats',
+                   'fiber': 'Fiber', 'glycemic_load': 'GL'}
+
+# ---------- Model Loading ----------
+
+def _load_yolo():
+    """Load the YOLO food detector on the configured runtime."""
+    return load_yolo(YOLO_WEIGHTS, YOLO_BACKEND, YOLO_INT8, YOLO_THREADS, DETECT_IMAGE_SIZE or 640, YOLO_CALIBRATION_DIR)
+
+def _load_ocr():
+    """Load PaddleOCR."""
+    from paddleocr import PaddleOCR
+    return PaddleOCR(use_angle_cls=True, lang="en", cpu_threads=OCR_CPU_THREADS)
+
+def warm_up_model(name, model):
+    """Run one inference on a blank image so the first real request skips graph initialisation."""
+    if name == 'yolo':
+        model.predict(Image.new("RGB", (640, 640)), verbose=False)
+    elif name == 'ocr':
+        model.ocr(np.full((64, 256, 3), 255, dtype=np.uint8), cls=True)
+
+MODEL_LOADERS = {'yolo': _load_yolo, 'ocr': _load_ocr}
+
+_unknown_models = [name for name in PRELOAD_MODELS if name not in MODEL_LOADERS]
+if _unknown_models:
+    raise ValueError(f"Unknown PRELOAD_MODELS {', '.join(_unknown_models)}; "
+                     f"valid names are {', '.join(MODEL_LOADERS)}")
+_models = {}
+_model_errors = {}
+_model_locks = {name: threading.Lock() for name in MODEL_LOADERS}
+
+def get_model(name):
+    """Return a loaded model, loading it on first use. Concurrent callers wait for one load."""
+    model = _models.get(name)
+    if model is not None:
+        return model
+    
+    with _model_locks[name]:
+        model = _models.get(name)
+        if model is None:
+            start = time.perf_counter()
+            try:
+                model = MODEL_LOADERS[name]()
+                # A pre-fork parent leaves warm-up to each worker (see configure_worker)
+                if MODEL_WARMUP and not PREFORK_SERVER:
+                    warm_up_model(name, model)
+            except Exception as e:
+                _model_errors[name] = str(e)
+                raise
+            _models[name] = model
+            _model_errors.pop(name, None)
+            print(f"Loaded {name} model in {time.perf_counter() - start:.1f}s")
+    return model
+
+def _preload_models():
+    """Load the PRELOAD_MODELS, logging failures instead of raising (used by the background thread)."""
+    for name in PRELOAD_MODELS:
+        try:
+            get_model(name)
+        except Exception as e:
+            print(f"Failed to load {name} model: {str(e)}")
+
+if MODEL_LOADING == 'eager':
+    for model_name in PRELOAD_MODELS:
+        get_model(model_name)
+elif MODEL_LOADING == 'background':
+    threading.Thread(target=_preload_models, name="model-preload", daemon=True).start()
+
+# PaddleOCR predictors are not thread-safe, so each concurrent OCR job checks out
+# its own instance. The first is the shared warm model; the rest load on demand.
+_ocr_pool = queue.Queue()
+_ocr_pool_size = 0
+_ocr_pool_lock = threading.Lock()
+
+def _checkout_ocr():
+    """Take an idle PaddleOCR instance, creating one if the pool is below OCR_WORKERS."""
+    global _ocr_pool_size
+    try:
+        return _ocr_pool.get_nowait()
+    except queue.Empty:
+        pass
+    
+    with _ocr_pool_lock:
+        if _ocr_pool_size < max(OCR_WORKERS, 1):
+            if _ocr_pool_size == 0:
+                engine = get_model('ocr')
+            else:
+                engine = _load_ocr()
+                if MODEL_WARMUP:
+                    warm_up_model('ocr', engine)
+            _ocr_pool_size += 1
+            return engine
+    return _ocr_pool.get()
+
+def run_ocr(image, use_angle_cls=True):
+    """Run OCR on an in-memory image array using a pooled PaddleOCR instance.
+    
+    `use_angle_cls` runs the text-direction classifier; skipping it saves time on
+    documents known to be upright.
+    """
+    engine = _checkout_ocr()
+    try:
+        return engine.ocr(image, cls=use_angle_cls)
+    finally:
+        _ocr_pool.put(engine)
+
+def ocr_text(image, use_angle_cls=True):
+    """OCR a prepared RGB image and return its lines joined by newlines."""
+    # PaddleOCR takes BGR arrays like cv2.imread
+    results = run_ocr(np.ascontiguousarray(np.asarray(image)[:, :, ::-1]), use_angle_cls)
+    return "\n".join([line[1][0] for res in results if res for line in res])
+
+# ---------- Multi-page Documents ----------
+
+# pdfium is not thread-safe, so every call into it is serialised
+_pdfium_lock = threading.Lock()
+_page_executor = ThreadPoolExecutor(max_workers=max(OCR_PAGE_CONCURRENCY, OCR_WORKERS, 1) * 2,
+                                    thread_name_prefix="ocr-page")
 
-UPLOAD_FOLDER = "uploads"
-os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+class UnsupportedDocument(Exception):
+    """The upload is a document type this server cannot open (e.g. a PDF without pypdfium2)."""
+
+def open_document(data):
+    """Open a PDF or multi-frame image as (page_count, render, close), or None for a single image.
+    
+    `render(index)` returns that page as a PIL image; pages are rendered only when asked
+    for, so memory is bounded by the pages in flight rather than the document size.
+    Raises UnsupportedDocument for a PDF when pypdfium2 is not installed.
+    """
+    if data[:5] == b'%PDF-':
+        try:
+            import pypdfium2 as pdfium  # Optional dependency, only needed for PDF uploads
+        except ImportError:
+            raise UnsupportedDocument("PDF uploads need the pypdfium2 package")
+        with _pdfium_lock:
+            pdf = pdfium.PdfDocument(data)
+            page_count = len(pdf)
+        
+        def render(index):
+            with _pdfium_lock:
+                page = pdf[index]
+                try:
+                    # Render at OCR_PDF_DPI, or smaller if that would exceed OCR_IMAGE_MAX_SIDE anyway
+                    scale = OCR_PDF_DPI / 72.0
+                    if OCR_IMAGE_MAX_SIDE:
+                        scale = min(scale, OCR_IMAGE_MAX_SIDE / max(page.get_size()))
+                    return page.render(scale=scale).to_pil()
+                finally:
+                    page.close()
+        
+        def close():
+            with _pdfium_lock:
+                pdf.close()
+        
+        return page_count, render, close
+    
+    frame_count = getattr(Image.open(io.BytesIO(data)), 'n_frames', 1)
+    if frame_count <= 1:
+        return None
+    
+    def render(index):
+        # A separate handle per page, so concurrent pages do not share seek state
+        frame = Image.open(io.BytesIO(data))
+        frame.seek(index)
+        return frame
+    
+    return frame_count, render, lambda: None
+
+def ocr_pages(document, grayscale=False, contrast=False, use_angle_cls=True):
+    """OCR the pages of an open_document() concurrently, yielding (index, text) as each finishes.
+    
+    At most OCR_PAGE_CONCURRENCY pages are in flight. A page that fails yields None as
+    its text. The document is closed once every started page has finished.
+    """
+    page_count, render, close = document
+    
+    def work(index):
+        try:
+            image = prepare_image(render(index), OCR_IMAGE_MAX_SIDE, grayscale, contrast)
+            return ocr_text(image, use_angle_cls)
+        except Exception as e:
+            print(f"OCR failed on page {index + 1}: {str(e)}")
+            return None
+    
+    in_flight = {}
+    next_index = 0
+    try:
+        while next_index < page_count or in_flight:
+            while next_index < page_count and len(in_flight) < max(OCR_PAGE_CONCURRENCY, 1):
+                in_flight[_page_executor.submit(work, next_index)] = next_index
+                next_index += 1
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield in_flight.pop(future), future.result()
+    finally:
+        # Also reached when a streaming client disconnects early
+        for future in in_flight:
+            future.cancel()
+        wait(in_flight)
+        close()
+
+# ---------- Inference Batching ----------
+
+class InferenceBatcher:
+    """Collect inference requests from concurrent workers and run them as one batched call.
+    
+    The first queued request opens a window of `window_ms`; everything that arrives
+    before it closes (up to `max_batch_size` items) goes through `run_batch` together,
+    and each caller gets back its own output.
+    """
+    
+    def __init__(self, run_batch, max_batch_size, window_ms):
+        self.run_batch = run_batch
+        self.max_batch_size = max_batch_size
+        self.window = window_ms / 1000.0
+        self._queue = queue.Queue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._requests = 0
+        self._batches = 0
+        self._batch_sizes = Counter()
+    
+    def submit(self, item):
+        """Run one input through the batch queue, blocking until its output is ready."""
+        if self.max_batch_size <= 1:
+            self._record([item])
+            return self.run_batch([item])[0]
+        
+        self._ensure_started()
+        future = Future()
+        self._queue.put((item, future))
+        return future.result()
+    
+    def _ensure_started(self):
+        # Started on first use so the thread exists in the process that serves requests
+        if self._thread is None or not self._thread.is_alive():
+            with self._start_lock:
+                if self._thread is None or not self._thread.is_alive():
+                    self._thread = threading.Thread(target=self._run, name="inference-batcher", daemon=True)
+                    self._thread.start()
+    
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.window
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            
+            inputs = [item for item, _ in batch]
+            self._record(inputs)
+            try:
+                outputs = self.run_batch(inputs)
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+            else:
+                for (_, future), output in zip(batch, outputs):
+                    future.set_result(output)
+    
+    def _record(self, inputs):
+        with self._stats_lock:
+            self._requests += len(inputs)
+            self._batches += 1
+            self._batch_sizes[len(inputs)] += 1
+    
+    def stats(self):
+        """Queue depth and batch-size statistics."""
+        with self._stats_lock:
+            return {
+                'queue_depth': self._queue.qsize(),
+                'max_batch_size': self.max_batch_size,
+                'window_ms': self.window * 1000.0,
+                'requests': self._requests,
+                'batches': self._batches,
+                'mean_batch_size': round(self._requests / self._batches, 2) if self._batches else 0,
+                'batch_sizes': {str(size): count for size, count in sorted(self._batch_sizes.items())}
+            }
+
+detection_batcher = InferenceBatcher(
+    lambda images: get_model('yolo').predict(images, verbose=False),
+    DETECT_BATCH_MAX_SIZE,
+    DETECT_BATCH_WINDOW_MS
+)
+
+# ---------- Result Caching ----------
+
+class ResultCache:
+    """Bounded LRU cache of JSON-serialisable results keyed by (namespace, content hash).
+    
+    Memory holds the `max_entries` most recently used results. When `disk_dir` is set,
+    results are also written there as JSON files (oldest evicted past `disk_max_entries`)
+    and read back into memory on a miss.
+    """
+    
+    def __init__(self, max_entries, disk_dir="", disk_max_entries=0):
+        self.max_entries = max_entries
+        self.disk_dir = disk_dir
+        self.disk_max_entries = disk_max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._counts = Counter()
+        self._disk_count = 0
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+            self._disk_count = sum(1 for name in os.listdir(disk_dir) if name.endswith(".json"))
+    
+    @staticmethod
+    def content_key(data, salt=""):
+        """Hash raw bytes (plus a salt such as the model path) into a cache key."""
+        digest = hashlib.sha256(salt.encode())
+        digest.update(b"\0")
+        digest.update(data)
+        return digest.hexdigest()
+    
+    def get(self, namespace, key):
+        """Return a cached result or None, recording hit/miss counts."""
+        entry_key = f"{namespace}-{key}"
+        with self._lock:
+            value = self._entries.get(entry_key)
+            if value is not None:
+                self._entries.move_to_end(entry_key)
+                self._counts['memory_hits'] += 1
+                return value
+        
+        if self.disk_dir:
+            try:
+                with open(os.path.join(self.disk_dir, entry_key + ".json")) as f:
+                    value = json.load(f)
+            except (OSError, ValueError):
+                value = None
+            if value is not None:
+                self._remember(entry_key, value)
+                with self._lock:
+                    self._counts['disk_hits'] += 1
+                return value
+        
+        with self._lock:
+            self._counts['misses'] += 1
+        return None
+    
+    def put(self, namespace, key, value):
+        """Store a result in memory and, if enabled, on disk."""
+        entry_key = f"{namespace}-{key}"
+        self._remember(entry_key, value)
+        if self.disk_dir:
+            self._write_disk(entry_key, value)
+    
+    def _remember(self, entry_key, value):
+        with self._lock:
+            self._entries[entry_key] = value
+            self._entries.move_to_end(entry_key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._counts['evictions'] += 1
+    
+    def _write_disk(self, entry_key, value):
+        path = os.path.join(self.disk_dir, entry_key + ".json")
+        try:
+            is_new = not os.path.exists(path)
+            # Write then rename so readers never see a partial file
+            fd, tmp_path = tempfile.mkstemp(dir=self.disk_dir, suffix=".tmp")
+            with os.fdopen(fd, "w") as f:
+                json.dump(value, f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Result cache write error: {str(e)}")
+            return
+        
+        with self._lock:
+            self._disk_count += int(is_new)
+            over_limit = self._disk_count > self.disk_max_entries
+        if over_limit:
+            self._evict_disk()
+    
+    def _evict_disk(self):
+        # Trim to 90% of the limit so the directory scan is not repeated on every write
+        paths = [os.path.join(self.disk_dir, name) for name in os.listdir(self.disk_dir) if name.endswith(".json")]
+        paths.sort(key=lambda path: os.path.getmtime(path) if os.path.exists(path) else 0)
+        excess = len(paths) - int(self.disk_max_entries * 0.9)
+        removed = 0
+        for path in paths[:max(excess, 0)]:
+            try:
+                os.remove(path)
+                removed += 1
+            except OSError:
+                pass
+        with self._lock:
+            self._disk_count = len(paths) - removed
+            self._counts['disk_evictions'] += removed
+    
+    def stats(self):
+        """Hit/miss counters and current sizes."""
+        with self._lock:
+            lookups = self._counts['memory_hits'] + self._counts['disk_hits'] + self._counts['misses']
+            hits = self._counts['memory_hits'] + self._counts['disk_hits']
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'disk_entries': self._disk_count if self.disk_dir else None,
+                'disk_max_entries': self.disk_max_entries if self.disk_dir else None,
+                'memory_hits': self._counts['memory_hits'],
+                'disk_hits': self._counts['disk_hits'],
+                'misses': self._counts['misses'],
+                'evictions': self._counts['evictions'],
+                'disk_evictions': self._counts['disk_evictions'],
+                'hit_rate': round(hits / lookups, 4) if lookups else 0
+            }
+
+result_cache = ResultCache(RESULT_CACHE_SIZE, RESULT_CACHE_DIR, RESULT_CACHE_DISK_MAX)
+response_cache = ResultCache(RESPONSE_CACHE_SIZE)
+candidate_cache = ResultCache(CANDIDATE_CACHE_SIZE)
+
+def cached_json_response(namespace, key, build, cacheable=None):
+    """Serve a JSON response that is a pure function of the catalogue and `key`.
+    
+    `build()` returns (payload, status) and runs only on the first request for a key;
+    the encoded bytes and their ETag are kept in response_cache (keyed by catalogue
+    version, so a reload never serves stale bodies). Conditional requests get a 304.
+    `cacheable(payload, status)`, if given, decides whether a built response is kept;
+    responses it rejects are sent uncached and without caching headers.
+    """
+    cache_key = f"{current_service().get('version')}:{key}"
+    entry = response_cache.get(namespace, cache_key)
+    if entry is None:
+        payload, status = build()
+        with timed_stage('encode'):
+            body = app.json.dumps(payload).encode()
+        if cacheable is not None and not cacheable(payload, status):
+            return app.response_class(body, status=status, mimetype='application/json')
+        entry = (body, status, hashlib.sha1(body).hexdigest())
+        response_cache.put(namespace, cache_key, entry)
+    
+    body, status, etag = entry
+    if status == 200 and request.if_none_match.contains(etag):
+        # Lookups are POSTs, so revalidation is handled here rather than by make_conditional
+        body = b''
+        status = 304
+    
+    response = app.response_class(body, status=status, mimetype='application/json')
+    response.set_etag(etag)
+    if status in (200, 304):
+        response.headers['Cache-Control'] = f'public, max-age={RESPONSE_CACHE_MAX_AGE}'
+    return response
+
+# ---------- Metrics ----------
+
+class LatencyHistogram:
+    """Cumulative latency histogram with fixed bucket bounds, in seconds."""
+    
+    def __init__(self, buckets=METRICS_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # Last slot is +Inf
+        self.total = 0.0
+    
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        self.total += seconds
+    
+    def prometheus_lines(self, name, labels):
+        """Render as Prometheus _bucket/_sum/_count samples."""
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + ['+Inf'], self.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+        lines.append(f'{name}_sum{{{labels}}} {self.total:.6f}')
+        lines.append(f'{name}_count{{{labels}}} {cumulative}')
+        return lines
+
+_metrics_lock = threading.Lock()
+_request_histograms = {}  # endpoint -> LatencyHistogram
+_stage_histograms = {}    # (endpoint, stage) -> LatencyHistogram
+_request_counts = Counter()  # (endpoint, status) -> count
+
+class _StageTimer:
+    """Adds the time spent in a `with` block to the current request's stage totals."""
+    
+    __slots__ = ('stage', 'start')
+    
+    def __init__(self, stage):
+        self.stage = stage
+    
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+    
+    def __exit__(self, *exc):
+        timings = g.stage_timings
+        timings[self.stage] = timings.get(self.stage, 0.0) + time.perf_counter() - self.start
+        return False
+
+class _NoTimer:
+    __slots__ = ()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        return False
+
+_NO_TIMER = _NoTimer()
+
+def timed_stage(stage):
+    """Context manager timing one stage of the current request (a no-op when metrics are off).
+    
+    A stage entered several times in one request (e.g. once per food group) is summed,
+    and the total is observed once when the request finishes.
+    """
+    if not METRICS_ENABLED or not has_request_context() or 'stage_timings' not in g:
+        return _NO_TIMER
+    return _StageTimer(stage)
+
+def _start_request_timer():
+    g.request_start = time.perf_counter()
+    g.stage_timings = {}
+
+def _record_request_timings(response):
+    if 'request_start' not in g:
+        return response
+    total = time.perf_counter() - g.request_start
+    endpoint = request.endpoint or 'unmatched'
+    
+    with _metrics_lock:
+        histogram = _request_histograms.get(endpoint)
+        if histogram is None:
+            histogram = _request_histograms[endpoint] = LatencyHistogram()
+        histogram.observe(total)
+        _request_counts[(endpoint, response.status_code)] += 1
+        for stage, seconds in g.stage_timings.items():
+            histogram = _stage_histograms.get((endpoint, stage))
+            if histogram is None:
+                histogram = _stage_histograms[(endpoint, stage)] = LatencyHistogram()
+            histogram.observe(seconds)
+    
+    if TIMING_HEADER:
+        stages = [f'{stage};dur={seconds * 1000:.3f}' for stage, seconds in g.stage_timings.items()]
+        response.headers['Server-Timing'] = ', '.join(stages + [f'total;dur={total * 1000:.3f}'])
+    return response
+
+if METRICS_ENABLED:
+    app.before_request(_start_request_timer)
+    app.after_request(_record_request_timings)
+
+def render_metrics():
+    """All histograms and counters in the Prometheus text exposition format."""
+    lines = [
+        '# HELP http_request_duration_seconds Request latency by endpoint.',
+        '# TYPE http_request_duration_seconds histogram'
+    ]
+    with _metrics_lock:
+        for endpoint, histogram in sorted(_request_histograms.items()):
+            lines += histogram.prometheus_lines('http_request_duration_seconds', f'endpoint="{endpoint}"')
+        
+        lines += [
+            '# HELP request_stage_duration_seconds Time spent in each stage of a request.',
+            '# TYPE request_stage_duration_seconds histogram'
+        ]
+        for (endpoint, stage), histogram in sorted(_stage_histograms.items()):
+            lines += histogram.prometheus_lines('request_stage_duration_seconds',
+                                                f'endpoint="{endpoint}",stage="{stage}"')
+        
+        lines += ['# HELP http_requests_total Requests by endpoint and status.', '# TYPE http_requests_total counter']
+        for (endpoint, status), count in sorted(_request_counts.items()):
+            lines.append(f'http_requests_total{{endpoint="{endpoint}",status="{status}"}} {count}')
+    
+    lines += ['# HELP cache_lookups_total Cache lookups by cache and outcome.', '# TYPE cache_lookups_total counter']
+    for cache_name, cache in (('results', result_cache), ('responses', response_cache),
+                              ('candidates', candidate_cache)):
+        stats = cache.stats()
+        for outcome in ('memory_hits', 'disk_hits', 'misses'):
+            lines.append(f'cache_lookups_total{{cache="{cache_name}",outcome="{outcome}"}} {stats[outcome]}')
+    
+    batcher = detection_batcher.stats()
+    lines += [
+        '# HELP detect_queue_depth Images waiting for a detection batch.',
+        '# TYPE detect_queue_depth gauge',
+        f'detect_queue_depth {batcher["queue_depth"]}',
+        '# HELP detect_batches_total Batched detection calls.',
+        '# TYPE detect_batches_total counter',
+        f'detect_batches_total {batcher["batches"]}'
+    ]
+    return '\n'.join(lines) + '\n'
 
 # ---------- Initialization (Runs once at startup) ----------
 
@@ -97,12 +851,12 @@ def filter_diabetes_friendly_foods(df):
     
     return filtered_df
 
-def compute_group_similarities(df, features):
+def compute_group_similarities(df, features, groups=FOOD_GROUPS):
     """Compute similarity matrices for each category group."""
     group_matrices = {}
     group_indices = {}
     
-    for group in ['beverage', 'dessert', 'snack', 'main']:
+    for group in groups:
         group_df = df[df['category_group'] == group]
         
         if len(group_df) > 1:  # Need at least 2 items to compute similarity
@@ -122,16 +876,418 @@ def compute_group_similarities(df, features):
     
     return group_matrices, group_indices
 
-def initialize_service():
-    """Load dataset and precompute similarity matrices"""
-    df = load_dataset('Indian_Foods_Dataset_With_Tags_Final.csv')
+def _top_k_sorted(scores, k):
+    """Return column positions and values of the k best scores per row, best first.
+    
+    Ties keep column order, matching a stable descending sort of the full row.
+    """
+    n = scores.shape[1]
+    if k < n:
+        # argpartition only finds the k-th best score; which of the columns tied with it
+        # it keeps is arbitrary, so take those tied columns in column order instead
+        kth = np.take_along_axis(scores, np.argpartition(-scores, k - 1, axis=1)[:, k - 1:k], axis=1)
+        above = scores > kth
+        tied = scores == kth
+        room = k - above.sum(axis=1, keepdims=True)
+        keep = above | (tied & (np.cumsum(tied, axis=1) <= room))
+        candidates = np.nonzero(keep)[1].reshape(len(scores), k)  # Column order within each row
+    else:
+        candidates = np.tile(np.arange(n), (len(scores), 1))
+    candidate_scores = np.take_along_axis(scores, candidates, axis=1)
+    order = np.argsort(-candidate_scores, axis=1, kind='stable')
+    return np.take_along_axis(candidates, order, axis=1), np.take_along_axis(candidate_scores, order, axis=1)
+
+def compute_group_neighbors(df, features, top_k=SIMILARITY_TOP_K, block_size=SIMILARITY_BLOCK_SIZE,
+                            groups=FOOD_GROUPS):
+    """Compute top-K neighbour tables for each category group without materialising n x n matrices.
+    
+    Each group gets an (n, k) array of dataset row indices and a matching float32 score
+    array, sorted by descending cosine similarity. Column 0 is normally the food itself,
+    so a request for N similar foods reads columns 1..N.
+    """
+    group_neighbors = {}
+    group_indices = {}
+    
+    for group in groups:
+        group_df = df[df['category_group'] == group]
+        
+        if len(group_df) > 1:  # Need at least 2 items to compute similarity
+            group_indices[group] = group_df.index
+            row_labels = group_df.index.to_numpy()
+            
+            # Scale, then L2-normalise so a dot product equals cosine similarity
+            scaled_features = StandardScaler().fit_transform(group_df[features].fillna(0))
+            unit_features = normalize(scaled_features).astype(np.float32)
+            
+            n = len(group_df)
+            k = min(top_k + 1, n)  # +1 leaves room for the food itself
+            neighbor_indices = np.empty((n, k), dtype=np.int32)
+            neighbor_scores = np.empty((n, k), dtype=np.float32)
+            
+            # Work in row blocks so peak memory is block_size x n, not n x n
+            for start in range(0, n, block_size):
+                block_scores = unit_features[start:start + block_size] @ unit_features.T
+                top_positions, top_scores = _top_k_sorted(block_scores, k)
+                
+                block_end = start + len(block_scores)
+                neighbor_indices[start:block_end] = row_labels[top_positions]
+                neighbor_scores[start:block_end] = top_scores
+            
+            group_neighbors[group] = (neighbor_indices, neighbor_scores)
+    
+    return group_neighbors, group_indices
+
+def _alternative_scores(query_features, candidate_features):
+    """Score healthy candidates against each query food.
+    
+    Vectorised equivalent of fitting a StandardScaler on the query stacked on top of the
+    candidates and taking cosine similarity, done for every query row at once. Matches the
+    per-request sklearn computation to float64 rounding (well within 1e-6).
+    """
+    # (b, m + 1, d): each query followed by every candidate
+    stacked = np.concatenate([
+        query_features[:, None, :],
+        np.broadcast_to(candidate_features, (len(query_features),) + candidate_features.shape)
+    ], axis=1)
+    n_samples = stacked.shape[1]
+    mean = stacked.mean(axis=1, keepdims=True)
+    var = stacked.var(axis=1, keepdims=True)
+    
+    # Near-constant features get unit scale, as in StandardScaler
+    eps = np.finfo(np.float64).eps
+    constant = var <= n_samples * eps * var + (n_samples * mean * eps) ** 2
+    scaled = (stacked - mean) / np.where(constant, 1.0, np.sqrt(var))
+    
+    # Cosine similarity between the query row and each candidate row
+    norms = np.linalg.norm(scaled, axis=2, keepdims=True)
+    unit = scaled / np.where(norms == 0, 1.0, norms)
+    return np.einsum('bd,bmd->bm', unit[:, 0], unit[:, 1:])
+
+def compute_alternatives_index(df, filtered_df, diabetic_mask, features,
+                               top_k=SIMILARITY_TOP_K, block_size=64, query_mask=None):
+    """Precompute healthy alternatives for every food that is not diabetes-friendly.
+    
+    Returns per-group candidate data (row indices and a contiguous feature matrix) plus
+    (n, top_k) arrays of alternative row indices and float32 scores for the full dataset.
+    Rows for diabetes-friendly foods and unused slots are filled with -1. When
+    `query_mask` is given, only those rows are scored (the rest are left as -1).
+    """
+    alternative_candidates = {}
+    alternative_indices = np.full((len(df), top_k), -1, dtype=np.int32)
+    alternative_scores = np.zeros((len(df), top_k), dtype=np.float32)
+    
+    for group in FOOD_GROUPS:
+        healthy = filtered_df[filtered_df['category_group'] == group]
+        if healthy.empty:
+            continue
+        
+        candidate_labels = healthy.index.to_numpy()
+        candidate_features = np.ascontiguousarray(healthy[features].fillna(0).to_numpy(dtype=np.float64))
+        alternative_candidates[group] = (candidate_labels, candidate_features)
+        
+        query_rows = (df['category_group'] == group).to_numpy() & ~diabetic_mask
+        if query_mask is not None:
+            query_rows &= query_mask
+        query_rows = np.flatnonzero(query_rows)
+        query_features = df[features].fillna(0).to_numpy(dtype=np.float64)[query_rows]
+        k = min(top_k, len(candidate_labels))
+        
+        # Blocks of queries keep the (b, m, d) working set bounded
+        for start in range(0, len(query_rows), block_size):
+            rows = query_rows[start:start + block_size]
+            scores = _alternative_scores(query_features[start:start + block_size], candidate_features)
+            top_positions, top_scores = _top_k_sorted(scores, k)
+            alternative_indices[rows, :k] = candidate_labels[top_positions]
+            alternative_scores[rows, :k] = top_scores
+    
+    return alternative_candidates, alternative_indices, alternative_scores
+
+def compute_group_signatures(filtered_df, features):
+    """Hash each group's diabetes-friendly foods (names and features, in order).
+    
+    Equal signatures mean the group's scaler, neighbours and alternative candidates
+    are unchanged, so a reload can reuse them.
+    """
+    signatures = {}
+    for group in FOOD_GROUPS:
+        group_df = filtered_df[filtered_df['category_group'] == group]
+        digest = hashlib.sha256()
+        digest.update('\0'.join(group_df['Food Name'].astype(str)).encode())
+        digest.update(np.ascontiguousarray(group_df[features].fillna(0).to_numpy(dtype=np.float64)).tobytes())
+        signatures[group] = digest.hexdigest()
+    return signatures
+
+def _map_previous_rows(previous, df):
+    """Map row indices of the previous catalogue to rows of `df` by food name (-1 when gone)."""
+    old_to_new = np.full(len(previous['full_df']), -1, dtype=np.int64)
+    seen = set()
+    for position, name in enumerate(df['Food Name']):
+        key = normalize_food_name(name)
+        if key in seen:
+            continue
+        seen.add(key)
+        old_position = previous['name_index'].get(key)
+        if old_position is not None:
+            old_to_new[old_position] = position
+    return old_to_new
+
+def normalize_food_name(name):
+    """Normalize a food name for index lookups (trimmed, lowercase)."""
+    return str(name).strip().lower()
+
+def build_food_index(df, filtered_df, group_indices):
+    """Build hash lookups so endpoints can resolve a food without scanning the dataset."""
+    # Normalized name -> row position in the full dataset (first match wins,
+    # mirroring the previous boolean-mask lookups)
+    name_index = {}
+    for position, name in enumerate(df['Food Name']):
+        name_index.setdefault(normalize_food_name(name), position)
+    
+    # Membership flag for the diabetes-friendly subset, by row position
+    diabetic_mask = df.index.isin(filtered_df.index)
+    
+    # Row label -> position inside its group similarity matrix
+    group_positions = {}
+    for group, indices in group_indices.items():
+        for position, idx in enumerate(indices):
+            group_positions[idx] = position
+    
+    return name_index, diabetic_mask, group_positions
+
+def current_service():
+    """The catalogue snapshot for the current request.
+    
+    Reloads swap the global service_data; pinning the snapshot on first use keeps
+    every lookup within one request on the same catalogue.
+    """
+    if not has_request_context():
+        return service_data
+    if 'service' not in g:
+        g.service = service_data
+    return g.service
+
+def lookup_food(food_name):
+    """Return the row index of a food in the full dataset, or None if it is unknown."""
+    return current_service()['name_index'].get(normalize_food_name(food_name))
+
+def _fuzzy_key(name):
+    """Collapse case, punctuation and spacing, so 'paneer-tikka ' matches 'Paneer Tikka'."""
+    return ' '.join(re.findall(r'[a-z0-9]+', str(name).lower()))
+
+def _trigrams(key):
+    """Character trigrams of a key, padded so word starts weigh more."""
+    padded = f"  {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+def build_fuzzy_index(df):
+    """Build a character-trigram index and a sorted prefix table over food names."""
+    keys, rows, key_entries = [], [], {}
+    for position, name in enumerate(df['Food Name']):
+        key = _fuzzy_key(name)
+        if key and key not in key_entries:
+            key_entries[key] = len(keys)
+            keys.append(key)
+            rows.append(position)
+    
+    # Trigram -> entries containing it
+    postings = {}
+    gram_counts = []
+    for entry, key in enumerate(keys):
+        grams = _trigrams(key)
+        gram_counts.append(len(grams))
+        for gram in grams:
+            postings.setdefault(gram, []).append(entry)
+    
+    # Every word start is a prefix entry, so 'tikka' also completes 'Paneer Tikka'
+    prefixes = sorted(
+        (key[match.start():], entry)
+        for entry, key in enumerate(keys)
+        for match in re.finditer(r'\b\w', key)
+    )
+    
+    return {
+        'keys': keys,
+        'rows': rows,
+        'key_entries': key_entries,
+        'postings': postings,
+        'gram_counts': gram_counts,
+        'prefixes': prefixes
+    }
+
+def fuzzy_search(query, limit=5):
+    """Return up to `limit` (row index, confidence) pairs for an approximate name match."""
+    index = current_service()['fuzzy_index']
+    key = _fuzzy_key(query)
+    if not key:
+        return []
+    
+    entry = index['key_entries'].get(key)
+    if entry is not None:
+        return [(index['rows'][entry], 1.0)]
+    
+    # Shortlist by trigram Dice coefficient, then rescore with edit similarity
+    grams = _trigrams(key)
+    overlap = Counter()
+    for gram in grams:
+        overlap.update(index['postings'].get(gram, ()))
+    gram_counts = index['gram_counts']
+    candidates = heapq.nlargest(
+        FUZZY_CANDIDATES, overlap,
+        key=lambda e: 2 * overlap[e] / (len(grams) + gram_counts[e])
+    )
+    
+    scored = [(e, difflib.SequenceMatcher(None, key, index['keys'][e]).ratio()) for e in candidates]
+    scored.sort(key=lambda x: x[1], reverse=True)
+    return [(index['rows'][e], round(score, 3)) for e, score in scored[:limit]]
+
+def prefix_search(prefix, limit=10):
+    """Return row indices of foods with a word starting with `prefix`, in name order."""
+    index = current_service()['fuzzy_index']
+    key = _fuzzy_key(prefix)
+    if not key:
+        return []
+    
+    prefixes = index['prefixes']
+    rows, seen = [], set()
+    for position in range(bisect.bisect_left(prefixes, (key, -1)), len(prefixes)):
+        text, entry = prefixes[position]
+        if not text.startswith(key) or len(rows) >= limit:
+            break
+        if entry not in seen:
+            seen.add(entry)
+            rows.append(index['rows'][entry])
+    return rows
+
+def resolve_food(food_name):
+    """Resolve a food name to (row index, confidence): exact first, then typo-tolerant.
+    
+    Returns (None, 0) when nothing clears FUZZY_MATCH_THRESHOLD.
+    """
+    food_idx = lookup_food(food_name)
+    if food_idx is not None:
+        return food_idx, 1.0
+    
+    matches = fuzzy_search(food_name, limit=1)
+    if matches and matches[0][1] >= FUZZY_MATCH_THRESHOLD:
+        return matches[0]
+    return None, 0
+
+def build_constraint_index(df, diabetic_mask):
+    """Precompute what /recommend constraints are resolved from, as flat name -> array.
+    
+    Diet flags and the diabetes-friendly mask are packed bitsets; each limit column is
+    kept sorted alongside its row order, so a cap or floor is one binary search.
+    """
+    if 'Vegan/Vegetarian' in df.columns:
+        diet = df['Vegan/Vegetarian'].astype(str).str.strip().str.lower()
+    else:
+        diet = pd.Series('', index=df.index)
+    flags = {
+        'diabetic': np.asarray(diabetic_mask, dtype=bool),
+        'vegan': (diet == 'vegan').to_numpy(),
+        # The ambiguous "Vegan/Vegetarian" tag only counts as vegetarian
+        'vegetarian': diet.isin(['vegan', 'vegetarian', 'vegan/vegetarian']).to_numpy()
+    }
+    index = {f'bits.{name}': np.packbits(mask) for name, mask in flags.items()}
+    
+    for column in sorted({column for column, _ in CONSTRAINT_LIMITS.values()}):
+        if column not in df.columns:
+            continue
+        values = pd.to_numeric(df[column], errors='coerce').to_numpy(dtype=np.float64)
+        order = np.argsort(values, kind='stable')  # NaNs sort last and never pass a limit
+        index[f'sorted.{column}.values'] = values[order]
+        index[f'sorted.{column}.order'] = order.astype(np.int32)
+    return index
+
+def build_meal_slot_index(df):
+    """Row indices per /meal-plan slot: its whole category group, and the foods tagged for that meal."""
+    groups = df['category_group'].to_numpy()
+    categories = df['Category'].astype(str).str.strip().to_numpy()
+    index = {}
+    for name, group, category, _ in MEAL_PLAN_SLOTS:
+        in_group = groups == group
+        index[f'{name}.group'] = np.flatnonzero(in_group).astype(np.int32)
+        index[f'{name}.preferred'] = np.flatnonzero(in_group & (categories == category)).astype(np.int32)
+    return index
+
+def parse_constraints(raw):
+    """Validate a constraints object from a request; returns a canonical tuple of (key, value).
+    
+    Raises ValueError with a client-facing message on unknown keys or bad values.
+    """
+    if raw is None:
+        return ()
+    if not isinstance(raw, dict):
+        raise ValueError('constraints must be an object')
+    
+    items = []
+    for key, value in raw.items():
+        if value is None:
+            continue
+        if key == 'diet':
+            diet = str(value).strip().lower()
+            if diet not in CONSTRAINT_DIETS:
+                raise ValueError(f"diet must be one of: {', '.join(CONSTRAINT_DIETS)}")
+            items.append((key, diet))
+        elif key in CONSTRAINT_LIMITS:
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                raise ValueError(f'{key} must be a number')
+            items.append((key, float(value)))
+        else:
+            raise ValueError(f"Unknown constraint '{key}'")
+    return tuple(sorted(items))
+
+def candidate_mask(constraints):
+    """Row mask of diabetes-friendly foods meeting parsed `constraints`, or None if there are none."""
+    if not constraints:
+        return None
+    
+    service = current_service()
+    cache_key = f"{service.get('version')}:{constraints!r}"
+    mask = candidate_cache.get('candidates', cache_key)
+    if mask is None:
+        mask = _resolve_candidates(service['constraint_index'], constraints, len(service['full_df']))
+        candidate_cache.put('candidates', cache_key, mask)
+    return mask
+
+def _resolve_candidates(index, constraints, n):
+    """AND the bitsets for each constraint together and unpack the result to a boolean mask."""
+    bits = np.array(index['bits.diabetic'])
+    for key, value in constraints:
+        if key == 'diet':
+            bits &= index[f'bits.{value}']
+            continue
+        
+        column, bound = CONSTRAINT_LIMITS[key]
+        if f'sorted.{column}.values' not in index:
+            # A limit on a column the catalogue lacks cannot be satisfied
+            bits[:] = 0
+            continue
+        values = index[f'sorted.{column}.values']
+        order = index[f'sorted.{column}.order']
+        if bound == 'max':
+            rows = order[:np.searchsorted(values, value, side='right')]
+        else:
+            rows = order[np.searchsorted(values, value, side='left'):np.searchsorted(values, np.inf, side='right')]
+        passing = np.zeros(n, dtype=bool)
+        passing[rows] = True
+        bits &= np.packbits(passing)
+    return np.unpackbits(bits, count=n).view(bool)
+
+def build_service(file_path, previous=None):
+    """Load dataset and precompute similarity data.
+    
+    With `previous` (the currently served catalogue), category groups whose
+    diabetes-friendly foods did not change reuse its similarity data.
+    """
+    df = load_dataset(file_path)
     
     if df is None:
         print("Error: Could not load dataset")
         return None
     
     # Define features for similarity calculation
-    features = ['Calories', 'Carbs', 'Fats', 'Protein', 'Fiber', 'GI', 'GL', 'Insulin Index']
+    features = list(SIMILARITY_FEATURES)
     
     # Ensure all feature columns exist and handle missing values
     for feature in features:
@@ -140,6 +1296,9 @@ def initialize_service():
         else:
             df[feature] = df[feature].fillna(0)
     
+    # Keep a default RangeIndex so row positions double as index labels
+    df = df.reset_index(drop=True)
+    
     # Categorize foods into groups
     df = categorize_food_groups(df)
     
@@ -151,127 +1310,721 @@ def initialize_service():
     dessert_count = len(filtered_df[filtered_df['category_group'] == 'dessert'])
     print(f"Found {dessert_count} diabetes-friendly desserts.")
     
-    # Compute similarity matrices for each group
-    group_matrices, group_indices = compute_group_similarities(filtered_df, features)
+    group_signatures = compute_group_signatures(filtered_df, features)
+    
+    # On reload, groups whose diabetes-friendly foods are unchanged keep their
+    # similarity data (with row indices remapped); only the others are recomputed
+    reused_groups = set()
+    if previous is not None:
+        old_to_new = _map_previous_rows(previous, df)
+        old_filtered = previous['filtered_df']
+        for group in FOOD_GROUPS:
+            old_labels = old_filtered.index[old_filtered['category_group'] == group].to_numpy()
+            new_labels = filtered_df.index[filtered_df['category_group'] == group].to_numpy()
+            if (previous.get('group_signatures', {}).get(group) == group_signatures[group]
+                    and np.array_equal(old_to_new[old_labels], new_labels)):
+                reused_groups.add(group)
+    rebuilt_groups = [group for group in FOOD_GROUPS if group not in reused_groups]
+    
+    # Compute similarity data for each group
+    group_matrices, group_neighbors = {}, {}
+    if SIMILARITY_MODE == 'dense':
+        group_matrices, group_indices = compute_group_similarities(filtered_df, features, rebuilt_groups)
+    else:
+        group_neighbors, group_indices = compute_group_neighbors(filtered_df, features, groups=rebuilt_groups)
+    
+    for group in reused_groups:
+        if group not in previous['group_indices']:
+            continue
+        group_indices[group] = filtered_df.index[filtered_df['category_group'] == group]
+        if group in previous['group_matrices']:
+            group_matrices[group] = previous['group_matrices'][group]
+        if group in previous['group_neighbors']:
+            old_indices, old_scores = previous['group_neighbors'][group]
+            group_neighbors[group] = (old_to_new[old_indices].astype(np.int32), old_scores)
+    
+    # Build O(1) name lookups and membership flags
+    name_index, diabetic_mask, group_positions = build_food_index(df, filtered_df, group_indices)
+    feature_matrix = df[features].to_numpy(dtype=np.float64)
+    
+    # Alternatives can be reused for unchanged non-friendly foods in reused groups
+    reuse_rows = np.zeros(len(df), dtype=bool)
+    if previous is not None:
+        new_to_old = np.full(len(df), -1, dtype=np.int64)
+        kept = old_to_new >= 0
+        new_to_old[old_to_new[kept]] = np.flatnonzero(kept)
+        has_old = new_to_old >= 0
+        old_rows = new_to_old[has_old]
+        reuse_rows[has_old] = (
+            ~np.asarray(previous['diabetic_mask'])[old_rows]
+            & (previous['full_df']['category_group'].to_numpy()[old_rows]
+               == df['category_group'].to_numpy()[has_old])
+            & (np.asarray(previous['feature_matrix'])[old_rows] == feature_matrix[has_old]).all(axis=1)
+        )
+        reuse_rows &= df['category_group'].isin(reused_groups).to_numpy() & ~diabetic_mask
+    
+    # Precompute healthy alternatives for foods that are not diabetes-friendly
+    alternative_candidates, alternative_indices, alternative_scores = compute_alternatives_index(
+        df, filtered_df, diabetic_mask, features, query_mask=~reuse_rows)
+    if reuse_rows.any():
+        old_alternatives = previous['alternative_indices'][new_to_old[reuse_rows]]
+        alternative_indices[reuse_rows] = np.where(old_alternatives >= 0, old_to_new[old_alternatives], -1)
+        alternative_scores[reuse_rows] = previous['alternative_scores'][new_to_old[reuse_rows]]
+    
+    if previous is not None:
+        print(f"Rebuilt similarity data for {rebuilt_groups or 'no groups'}; "
+              f"reused alternatives for {int(reuse_rows.sum())} foods.")
     
     return {
         'full_df': df,
         'filtered_df': filtered_df,
         'group_matrices': group_matrices,
+        'group_neighbors': group_neighbors,
         'group_indices': group_indices,
-        'features': features
+        'features': features,
+        'feature_matrix': feature_matrix,
+        'group_signatures': group_signatures,
+        'name_index': name_index,
+        'diabetic_mask': diabetic_mask,
+        'group_positions': group_positions,
+        'alternative_candidates': alternative_candidates,
+        'alternative_indices': alternative_indices,
+        'alternative_scores': alternative_scores,
+        'constraint_index': build_constraint_index(df, diabetic_mask),
+        'meal_slot_rows': build_meal_slot_index(df),
+        'fuzzy_index': build_fuzzy_index(df)
     }
 
+def catalogue_fingerprint(file_path):
+    """Hash the catalogue source together with the settings that shape the compiled data."""
+    if not os.path.exists(file_path):
+        return None
+    
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    settings = [CATALOGUE_FORMAT_VERSION, SIMILARITY_MODE, SIMILARITY_TOP_K, SIMILARITY_FEATURES]
+    digest.update(json.dumps(settings).encode())
+    return digest.hexdigest()
+
+# Service entries stored as JSON; the catalogue table and everything else are numpy arrays
+_COMPILED_OBJECTS = ['features', 'name_index', 'fuzzy_index', 'group_signatures']
+
+def _frame_parts(df):
+    """Split a catalogue table into numeric column arrays and JSON-safe text columns."""
+    arrays, columns = {}, []
+    for position, (name, column) in enumerate(df.items()):
+        if column.dtype.kind in 'biuf':
+            arrays[f'full_df.{position}'] = column.to_numpy()
+            columns.append({'name': name, 'dtype': str(column.dtype)})
+        else:
+            values = [None if pd.isna(value) else value for value in column]
+            columns.append({'name': name, 'dtype': str(column.dtype), 'values': values})
+    return arrays, columns
+
+def _frame_from_parts(arrays, columns):
+    """Rebuild the catalogue table (with the RangeIndex it is built with) from _frame_parts output."""
+    data = {}
+    for position, column in enumerate(columns):
+        if 'values' in column:
+            data[column['name']] = pd.Series(column['values'], dtype=column['dtype'])
+        else:
+            data[column['name']] = np.asarray(arrays[f'full_df.{position}'])
+    return pd.DataFrame(data)
+
+def _service_arrays(service):
+    """Flatten the numpy parts of a service dict into name -> array."""
+    arrays = {
+        'diabetic_mask': service['diabetic_mask'],
+        'feature_matrix': service['feature_matrix'],
+        'alternative_indices': service['alternative_indices'],
+        'alternative_scores': service['alternative_scores']
+    }
+    for group, index in service['group_indices'].items():
+        arrays[f'group_indices.{group}'] = index.to_numpy()
+    for group, matrix in service['group_matrices'].items():
+        arrays[f'group_matrices.{group}'] = matrix
+    for group, (indices, scores) in service['group_neighbors'].items():
+        arrays[f'group_neighbors.{group}.indices'] = indices
+        arrays[f'group_neighbors.{group}.scores'] = scores
+    for group, (labels, candidate_features) in service['alternative_candidates'].items():
+        arrays[f'alternative_candidates.{group}.labels'] = labels
+        arrays[f'alternative_candidates.{group}.features'] = candidate_features
+    for prefix in ('constraint_index', 'meal_slot_rows'):
+        for name, array in service[prefix].items():
+            arrays[f'{prefix}.{name}'] = array
+    return arrays
+
+def compile_catalogue(service, cache_dir, fingerprint):
+    """Write a built service to `cache_dir/<fingerprint>/` as .npy arrays plus JSON.
+    
+    Nothing is pickled, so loading a compiled catalogue never runs code from the cache
+    directory; a tampered file fails to parse and the catalogue is rebuilt.
+    
+    The directory is assembled under a temporary name and renamed into place, so a
+    concurrently starting worker sees either the complete catalogue or none.
+    """
+    target = os.path.join(cache_dir, fingerprint[:16])
+    if os.path.exists(os.path.join(target, 'meta.json')):
+        return target
+    
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(dir=cache_dir, prefix='.compile-')
+    try:
+        arrays = _service_arrays(service)
+        frame_arrays, columns = _frame_parts(service['full_df'])
+        arrays.update(frame_arrays)
+        for name, array in arrays.items():
+            np.save(os.path.join(tmp_dir, name + '.npy'), np.ascontiguousarray(array), allow_pickle=False)
+        objects = {key: service[key] for key in _COMPILED_OBJECTS}
+        objects['full_df'] = columns
+        objects['group_positions'] = list(service['group_positions'].items())  # JSON keys are strings
+        with open(os.path.join(tmp_dir, 'objects.json'), 'w') as f:
+            json.dump(objects, f)
+        with open(os.path.join(tmp_dir, 'meta.json'), 'w') as f:
+            json.dump({'fingerprint': fingerprint, 'arrays': sorted(arrays)}, f)
+        os.rename(tmp_dir, target)
+    except OSError as e:
+        # Another worker may have won the rename; either way the service is usable
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        if not os.path.exists(os.path.join(target, 'meta.json')):
+            print(f"Catalogue compile error: {str(e)}")
+            return None
+    
+    # Drop catalogues compiled from older sources
+    for name in os.listdir(cache_dir):
+        path = os.path.join(cache_dir, name)
+        if name != fingerprint[:16] and not name.startswith('.') and os.path.isdir(path):
+            shutil.rmtree(path, ignore_errors=True)
+    
+    print(f"Compiled catalogue to {target}")
+    return target
+
+def load_compiled_catalogue(cache_dir, fingerprint):
+    """Map a compiled catalogue back into a service dict, or return None if it is missing or stale."""
+    target = os.path.join(cache_dir, fingerprint[:16])
+    if not os.path.exists(os.path.join(target, 'meta.json')):
+        return None
+    
+    try:
+        with open(os.path.join(target, 'meta.json')) as f:
+            meta = json.load(f)
+        if meta['fingerprint'] != fingerprint:
+            return None
+        
+        arrays = {name: np.load(os.path.join(target, name + '.npy'), mmap_mode='r', allow_pickle=False)
+                  for name in meta['arrays']}
+        with open(os.path.join(target, 'objects.json')) as f:
+            objects = json.load(f)
+        service = {key: objects[key] for key in _COMPILED_OBJECTS}
+        service['full_df'] = _frame_from_parts(arrays, objects['full_df'])
+        service['group_positions'] = {int(food_idx): position for food_idx, position in objects['group_positions']}
+        service['fuzzy_index']['prefixes'] = [tuple(prefix) for prefix in service['fuzzy_index']['prefixes']]
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        print(f"Compiled catalogue unusable, rebuilding: {str(e)}")
+        return None
+    
+    service.update({
+        'diabetic_mask': arrays['diabetic_mask'],
+        'feature_matrix': arrays['feature_matrix'],
+        'alternative_indices': arrays['alternative_indices'],
+        'alternative_scores': arrays['alternative_scores'],
+        'group_indices': {},
+        'group_matrices': {},
+        'group_neighbors': {},
+        'alternative_candidates': {},
+        'constraint_index': {},
+        'meal_slot_rows': {}
+    })
+    for name, array in arrays.items():
+        prefix, _, key = name.partition('.')
+        if prefix in ('constraint_index', 'meal_slot_rows'):
+            service[prefix][key] = array
+            continue
+        parts = name.split('.')
+        if parts[0] in ('group_indices', 'group_matrices'):
+            service[parts[0]][parts[1]] = pd.Index(array) if parts[0] == 'group_indices' else array
+        elif parts[0] == 'group_neighbors' and parts[2] == 'indices':
+            service['group_neighbors'][parts[1]] = (array, arrays[f'group_neighbors.{parts[1]}.scores'])
+        elif parts[0] == 'alternative_candidates' and parts[2] == 'labels':
+            service['alternative_candidates'][parts[1]] = (
+                array, arrays[f'alternative_candidates.{parts[1]}.features'])
+    
+    service['filtered_df'] = service['full_df'][np.asarray(service['diabetic_mask'])].copy()
+    print(f"Loaded compiled catalogue from {target} ({len(service['full_df'])} foods)")
+    return service
+
+def initialize_service():
+    """Load the catalogue from its compiled form when current, otherwise build (and compile) it"""
+    fingerprint = catalogue_fingerprint(CATALOGUE_PATH)
+    if fingerprint and CATALOGUE_CACHE_DIR:
+        service = load_compiled_catalogue(CATALOGUE_CACHE_DIR, fingerprint)
+        if service is not None:
+            service['version'] = fingerprint[:16]
+            return service
+    
+    service = build_service(CATALOGUE_PATH)
+    if service is not None and fingerprint:
+        # Same source and settings give the same version in every worker
+        service['version'] = fingerprint[:16]
+        if CATALOGUE_CACHE_DIR and compile_catalogue(service, CATALOGUE_CACHE_DIR, fingerprint):
+            # Serve from the mapped files so forked workers share the arrays through the page cache
+            compiled = load_compiled_catalogue(CATALOGUE_CACHE_DIR, fingerprint)
+            if compiled is not None:
+                compiled['version'] = service['version']
+                service = compiled
+    return service
+
 service_data = initialize_service()
 
-# Define handle_dessert_recommendation BEFORE it's called in the recommend function
-def handle_dessert_recommendation(food_name):
-    """Special handling for dessert recommendations - always recommend fruit salad"""
-    df = service_data['full_df']
+# ---------- Catalogue Reload ----------
+
+_reload_lock = threading.Lock()
+
+def reload_catalogue():
+    """Rebuild the catalogue from CATALOGUE_PATH and swap it in atomically.
     
-    food_data = df[df['Food Name'].str.lower() == food_name.lower()]
-    if food_data.empty:
-        return jsonify({'type': 'error', 'message': f"Food '{food_name}' not found in database"}), 404
+    The new service is fully built before the single assignment to service_data, so
+    requests see either the old catalogue or the new one, never a mix. Like
+    initialize_service, it serves from the compiled files, so pre-fork workers keep
+    sharing the arrays after a reload; a worker that finds the new version already
+    compiled (by another worker) just maps it.
+    Returns (ok, message).
+    """
+    global service_data
+    with _reload_lock:
+        start = time.perf_counter()
+        fingerprint = catalogue_fingerprint(CATALOGUE_PATH)
+        service = None
+        if fingerprint and CATALOGUE_CACHE_DIR:
+            service = load_compiled_catalogue(CATALOGUE_CACHE_DIR, fingerprint)
+        
+        if service is None:
+            service = build_service(CATALOGUE_PATH, previous=service_data)
+            if service is None:
+                return False, "Could not load dataset; keeping the current catalogue"
+            if fingerprint and CATALOGUE_CACHE_DIR and compile_catalogue(service, CATALOGUE_CACHE_DIR, fingerprint):
+                compiled = load_compiled_catalogue(CATALOGUE_CACHE_DIR, fingerprint)
+                if compiled is not None:
+                    service = compiled
+        
+        service['version'] = fingerprint[:16] if fingerprint else f"reload-{time.time_ns()}"
+        service_data = service
+        return True, f"Reloaded {len(service['full_df'])} foods in {time.perf_counter() - start:.2f}s"
+
+def _watch_catalogue(interval):
+    """Poll the catalogue file and reload it when its size or mtime changes."""
+    def file_state():
+        try:
+            stat = os.stat(CATALOGUE_PATH)
+            return stat.st_mtime_ns, stat.st_size
+        except OSError:
+            return None
     
-    # Create fruit salad recommendations
-    fruit_salad_recommendations = [
-        {
-            'name': 'Fresh Fruit Salad',
-            'category': 'Healthy Dessert',
-            'group': 'dessert',
-            'health_status': 'diabetic_friendly',
-            'processed_level': 'unprocessed',
-            'preparation': 'Mix fresh seasonal fruits like strawberries, kiwi, oranges, and blueberries.',
-            'portion': 'One cup (about 150g)',
-            'similarity': 0.95,
-            'nutrition': {
-                'calories': 85,
-                'carbs': 21,
-                'protein': 1,
-                'fats': 0
-            }
-        },
-        {
-            'name': 'Citrus Fruit Salad',
-            'category': 'Healthy Dessert',
-            'group': 'dessert',
-            'health_status': 'diabetic_friendly',
-            'processed_level': 'unprocessed',
-            'preparation': 'Combine oranges, grapefruit, and mandarin segments with a hint of mint.',
-            'portion': 'One cup (about 150g)',
-            'similarity': 0.90,
-            'nutrition': {
-                'calories': 70,
-                'carbs': 17,
-                'protein': 1,
-                'fats': 0
-            }
-        },
-        {
-            'name': 'Berry Fruit Salad',
-            'category': 'Healthy Dessert',
-            'group': 'dessert',
-            'health_status': 'diabetic_friendly',
-            'processed_level': 'unprocessed',
-            'preparation': 'Mix strawberries, blueberries, raspberries, and blackberries.',
-            'portion': 'One cup (about 150g)',
-            'similarity': 0.85,
-            'nutrition': {
-                'calories': 75,
-                'carbs': 16,
-                'protein': 1,
-                'fats': 0
-            }
-        },
-        {
-            'name': 'Tropical Fruit Salad',
-            'category': 'Healthy Dessert',
-            'group': 'dessert',
-            'health_status': 'diabetic_friendly',
-            'processed_level': 'unprocessed',
-            'preparation': 'Combine pineapple, mango, kiwi, and banana in small portions.',
-            'portion': 'Half cup (about 75g)',
-            'similarity': 0.80,
-            'nutrition': {
-                'calories': 90,
-                'carbs': 23,
-                'protein': 1,
-                'fats': 0
-            }
+    last_state = file_state()
+    while True:
+        time.sleep(interval)
+        state = file_state()
+        if state is not None and state != last_state:
+            last_state = state
+            ok, message = reload_catalogue()
+            print(f"Catalogue change detected: {message}")
+
+def start_catalogue_watch():
+    """Start the catalogue file watcher if CATALOGUE_WATCH_INTERVAL is set."""
+    if CATALOGUE_WATCH_INTERVAL > 0:
+        threading.Thread(target=_watch_catalogue, args=(CATALOGUE_WATCH_INTERVAL,),
+                         name="catalogue-watch", daemon=True).start()
+
+# Threads do not survive fork, so a pre-fork server starts this in each worker
+if not PREFORK_SERVER:
+    start_catalogue_watch()
+
+# ---------- Pre-fork Workers ----------
+
+def configure_worker(cpu_threads):
+    """Per-worker setup after a pre-fork server forks this process from the loaded parent.
+    
+    Caps torch and BLAS threads at `cpu_threads` so workers do not oversubscribe the CPU
+    (PaddleOCR takes OCR_CPU_THREADS when it is built), warms up the inherited models and
+    starts the catalogue watcher.
+    """
+    if 'torch' in sys.modules:
+        sys.modules['torch'].set_num_threads(cpu_threads)
+    try:
+        from threadpoolctl import threadpool_limits
+        threadpool_limits(cpu_threads)
+    except ImportError:
+        pass
+    
+    # ONNX Runtime and OpenVINO thread pools do not survive a fork; the export itself
+    # is already on disk, so reopening it is quick
+    if YOLO_BACKEND != 'pytorch' and 'yolo' in _models:
+        _models['yolo'] = _load_yolo()
+    
+    if MODEL_WARMUP:
+        for name, model in list(_models.items()):
+            warm_up_model(name, model)
+    start_catalogue_watch()
+
+# ---------- Meal Planning ----------
+
+def parse_meal_plan_request(data):
+    """Validate a /meal-plan body into keyword arguments for plan_meals.
+    
+    Raises ValueError with a client-facing message on missing or bad values.
+    """
+    targets = data.get('targets')
+    if not isinstance(targets, dict) or targets.get('calories') is None:
+        raise ValueError('targets.calories is required')
+    
+    parsed_targets = {}
+    for key, value in targets.items():
+        if key not in MEAL_PLAN_NUTRIENTS:
+            raise ValueError(f"Unknown target '{key}'")
+        if value is None:
+            continue
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or value <= 0:
+            raise ValueError(f'targets.{key} must be a positive number')
+        parsed_targets[key] = float(value)
+    
+    max_gl = data.get('max_gl')
+    if max_gl is not None and (isinstance(max_gl, bool) or not isinstance(max_gl, (int, float)) or max_gl <= 0):
+        raise ValueError('max_gl must be a positive number')
+    
+    slot_names = [slot[0] for slot in MEAL_PLAN_SLOTS]
+    slots = data.get('slots') or slot_names
+    if not isinstance(slots, list) or any(slot not in slot_names for slot in slots):
+        raise ValueError(f"slots must be a list drawn from: {', '.join(slot_names)}")
+    
+    budget = data.get('time_budget_ms', MEAL_PLAN_BUDGET_MS)
+    if isinstance(budget, bool) or not isinstance(budget, (int, float)) or budget <= 0:
+        raise ValueError('time_budget_ms must be a positive number')
+    
+    return {
+        'targets': parsed_targets,
+        'max_gl': float(max_gl) if max_gl is not None else None,
+        'slots': list(dict.fromkeys(slots)),
+        'constraints': parse_constraints(data.get('constraints')),
+        'time_budget_ms': min(float(budget), MEAL_PLAN_MAX_BUDGET_MS)
+    }
+
+def _meal_slot_candidates(service, suitable, slot, nutrient_columns, portions):
+    """Every (food, portion) option for one slot: rows, portions, nutrient totals and GL."""
+    # Prefer suitable foods tagged for this meal, falling back to the whole group
+    preferred = np.asarray(service['meal_slot_rows'][f'{slot}.preferred'])
+    rows = preferred[suitable[preferred]]
+    if len(rows) == 0:
+        group_rows = np.asarray(service['meal_slot_rows'][f'{slot}.group'])
+        rows = group_rows[suitable[group_rows]]
+    
+    feature_matrix = np.asarray(service['feature_matrix'])
+    candidate_rows = np.repeat(rows, len(portions))
+    candidate_portions = np.tile(np.asarray(portions, dtype=np.float64), len(rows))
+    nutrients = feature_matrix[candidate_rows][:, nutrient_columns] * candidate_portions[:, None]
+    gl = feature_matrix[candidate_rows, service['features'].index('GL')] * candidate_portions
+    return candidate_rows, candidate_portions, nutrients, gl
+
+def plan_meals(targets, max_gl=None, slots=None, constraints=(), time_budget_ms=MEAL_PLAN_BUDGET_MS):
+    """Pick one (food, portion) per slot to get the day's totals close to `targets` within `max_gl`.
+    
+    The objective is the weighted sum of squared relative misses on each targeted nutrient
+    (calories count double), with the total glycemic load as a hard cap and no food used
+    twice. Each slot is shortlisted to the MEAL_PLAN_CANDIDATES options closest to its share
+    of the targets; a depth-first branch and bound over the shortlists (children tried in
+    order of their lower bound, so the first leaf is the greedy plan) finds the best
+    combination, then single-slot swaps over every option polish it. The time budget is
+    hard: when it runs out the best plan so far is returned with `complete` false, or, if
+    the search had not reached a complete plan yet, a greedy one (slots with no feasible
+    option left are reported in `unfilled`).
+    
+    Returns a dict with the chosen items, totals, objective and search statistics, or None
+    when no combination fits the glycemic load cap.
+    """
+    start = time.perf_counter()
+    deadline = start + time_budget_ms / 1000.0
+    service = current_service()
+    df = service['full_df']
+    
+    keys = list(targets)
+    nutrient_columns = [service['features'].index(MEAL_PLAN_NUTRIENTS[key]) for key in MEAL_PLAN_NUTRIENTS]
+    target = np.array([targets[key] for key in keys])
+    target_columns = [list(MEAL_PLAN_NUTRIENTS).index(key) for key in keys]
+    weights = np.array([2.0 if key == 'calories' else 1.0 for key in keys]) / target ** 2
+    gl_cap = max_gl if max_gl is not None else np.inf
+    
+    allowed = candidate_mask(constraints)
+    suitable = np.asarray(service['diabetic_mask']) if allowed is None else allowed
+    
+    # Candidate options per slot, dropping any that alone exceed the GL cap
+    chosen_slots = [slot for slot in MEAL_PLAN_SLOTS if slots is None or slot[0] in slots]
+    share_total = sum(slot[3] for slot in chosen_slots)
+    options, unfilled = [], []
+    for name, _, _, share in chosen_slots:
+        rows, portions, nutrients, gl = _meal_slot_candidates(
+            service, suitable, name, nutrient_columns, MEAL_PLAN_PORTIONS)
+        fits = gl <= gl_cap
+        rows, portions, nutrients, gl = rows[fits], portions[fits], nutrients[fits][:, target_columns], gl[fits]
+        if len(rows) == 0:
+            unfilled.append(name)
+            continue
+        
+        slot_target = target * share / share_total
+        closeness = (((nutrients - slot_target) ** 2) * weights).sum(axis=1)
+        shortlist = np.argsort(closeness, kind='stable')[:MEAL_PLAN_CANDIDATES]
+        # Keep the lowest-GL options too, so a tight GL cap still has a feasible combination
+        low_gl = np.argsort(gl, kind='stable')[:max(1, MEAL_PLAN_CANDIDATES // 5)]
+        shortlist = np.concatenate([shortlist, np.setdiff1d(low_gl, shortlist)])
+        options.append({'slot': name, 'rows': rows, 'portions': portions, 'nutrients': nutrients, 'gl': gl,
+                        'shortlist': shortlist})
+    
+    if not options:
+        return None
+    
+    # Suffix bounds: the least and most each remaining slot can add, per nutrient and GL
+    depth_count = len(options)
+    remaining_min = np.zeros((depth_count + 1, len(keys)))
+    remaining_max = np.zeros((depth_count + 1, len(keys)))
+    remaining_gl = np.zeros(depth_count + 1)
+    for depth in range(depth_count - 1, -1, -1):
+        shortlisted = options[depth]['nutrients'][options[depth]['shortlist']]
+        remaining_min[depth] = remaining_min[depth + 1] + shortlisted.min(axis=0)
+        remaining_max[depth] = remaining_max[depth + 1] + shortlisted.max(axis=0)
+        remaining_gl[depth] = remaining_gl[depth + 1] + options[depth]['gl'][options[depth]['shortlist']].min()
+    
+    best = {'score': np.inf, 'picks': None}
+    stats = {'nodes': 0, 'timed_out': False}
+    
+    def search(depth, totals, total_gl, picks, used_rows):
+        stats['nodes'] += 1
+        if time.perf_counter() > deadline:
+            stats['timed_out'] = True
+            return
+        
+        option = options[depth]
+        shortlist = option['shortlist']
+        child_totals = totals + option['nutrients'][shortlist]
+        child_gl = total_gl + option['gl'][shortlist]
+        
+        # Lower bound per child: the miss left even if later slots land as well as possible
+        low = child_totals + remaining_min[depth + 1]
+        high = child_totals + remaining_max[depth + 1]
+        gap = np.maximum(low - target, 0) + np.maximum(target - high, 0)
+        bounds = (gap ** 2 * weights).sum(axis=1)
+        feasible = (child_gl + remaining_gl[depth + 1] <= gl_cap) & ~np.isin(option['rows'][shortlist], used_rows)
+        
+        for child in np.argsort(bounds, kind='stable'):
+            if bounds[child] + MEAL_PLAN_TOLERANCE >= best['score'] or stats['timed_out']:
+                break
+            if not feasible[child]:
+                continue
+            if depth + 1 == depth_count:
+                # At a leaf the bound is the exact objective
+                best['score'] = bounds[child]
+                best['picks'] = picks + [shortlist[child]]
+                break
+            search(depth + 1, child_totals[child], child_gl[child], picks + [shortlist[child]],
+                   used_rows + [option['rows'][shortlist[child]]])
+    
+    def greedy():
+        """Slot by slot, the feasible option with the lowest bound over every candidate; None
+        for a slot where nothing fits the GL left or every option's food is already used."""
+        totals, total_gl, picks, used_rows = np.zeros(len(keys)), 0.0, [], []
+        for depth, option in enumerate(options):
+            child_totals = totals + option['nutrients']
+            low = child_totals + remaining_min[depth + 1]
+            high = child_totals + remaining_max[depth + 1]
+            gap = np.maximum(low - target, 0) + np.maximum(target - high, 0)
+            bounds = (gap ** 2 * weights).sum(axis=1)
+            # Prefer options that leave GL room for the later slots, but settle for any that fit
+            bounds[np.isin(option['rows'], used_rows) | (total_gl + option['gl'] > gl_cap)] = np.inf
+            leaves_room = total_gl + option['gl'] + remaining_gl[depth + 1] <= gl_cap
+            if np.isfinite(bounds[leaves_room]).any():
+                bounds[~leaves_room] = np.inf
+            pick = int(np.argmin(bounds))
+            if not np.isfinite(bounds[pick]):
+                picks.append(None)
+                continue
+            picks.append(pick)
+            totals, total_gl = child_totals[pick], total_gl + option['gl'][pick]
+            used_rows.append(option['rows'][pick])
+        return picks
+    
+    search(0, np.zeros(len(keys)), 0.0, [], [])
+    if best['picks'] is None:
+        if not stats['timed_out']:
+            return None
+        # Out of time before the first complete plan: fall back to the greedy one
+        picks = greedy()
+        unfilled += [option['slot'] for option, pick in zip(options, picks) if pick is None]
+        options = [option for option, pick in zip(options, picks) if pick is not None]
+        if not options:
+            return None
+        best['picks'] = [pick for pick in picks if pick is not None]
+        depth_count = len(options)
+        totals = sum(option['nutrients'][pick] for option, pick in zip(options, best['picks']))
+        best['score'] = float((((totals - target) ** 2) * weights).sum())
+    
+    # Polish: swap one slot at a time to its best option over the full candidate set
+    picks = list(best['picks'])
+    totals = sum(option['nutrients'][pick] for option, pick in zip(options, picks))
+    total_gl = sum(option['gl'][pick] for option, pick in zip(options, picks))
+    improved = True
+    while improved and time.perf_counter() <= deadline:
+        improved = False
+        for depth, option in enumerate(options):
+            base_totals = totals - option['nutrients'][picks[depth]]
+            base_gl = total_gl - option['gl'][picks[depth]]
+            other_rows = [options[other]['rows'][picks[other]] for other in range(depth_count) if other != depth]
+            scores = (((base_totals + option['nutrients'] - target) ** 2) * weights).sum(axis=1)
+            scores[(base_gl + option['gl'] > gl_cap) | np.isin(option['rows'], other_rows)] = np.inf
+            candidate = int(np.argmin(scores))
+            if scores[candidate] < best['score'] - 1e-12:
+                picks[depth] = candidate
+                totals = base_totals + option['nutrients'][candidate]
+                total_gl = base_gl + option['gl'][candidate]
+                best['score'] = scores[candidate]
+                improved = True
+    
+    feature_matrix = np.asarray(service['feature_matrix'])
+    items = []
+    for option, pick in zip(options, picks):
+        idx = int(option['rows'][pick])
+        portion = float(option['portions'][pick])
+        values = feature_matrix[idx, nutrient_columns] * portion
+        items.append({
+            'slot': option['slot'],
+            'food_name': df.at[idx, 'Food Name'].strip(),
+            'category': df.at[idx, 'Category'],
+            'portion': portion,
+            **{key: round(float(value), 1) for key, value in zip(MEAL_PLAN_NUTRIENTS, values)},
+            'glycemic_load': round(float(option['gl'][pick]), 1)
+        })
+    
+    return {
+        'items': items,
+        'totals': {
+            **{key: round(sum(item[key] for item in items), 1) for key in MEAL_PLAN_NUTRIENTS},
+            'glycemic_load': round(sum(item['glycemic_load'] for item in items), 1)
         },
-        {
-            'name': 'Yogurt Fruit Salad',
-            'category': 'Healthy Dessert',
-            'group': 'dessert',
-            'health_status': 'diabetic_friendly',
-            'processed_level': 'minimally processed',
-            'preparation': 'Mix fresh fruits with a small amount of plain Greek yogurt and a sprinkle of nuts.',
-            'portion': 'One cup (about 175g)',
-            'similarity': 0.75,
-            'nutrition': {
-                'calories': 120,
-                'carbs': 20,
-                'protein': 7,
-                'fats': 2
-            }
+        'score': round(float(best['score']), 6),
+        'complete': not stats['timed_out'] and not improved,
+        'unfilled': unfilled,
+        'search': {'nodes': stats['nodes'], 'elapsed_ms': round((time.perf_counter() - start) * 1000.0, 2)}
+    }
+
+# Fruit salad options offered instead of any dessert (built once, reused by every response)
+FRUIT_SALAD_RECOMMENDATIONS = [
+    {
+        'name': 'Fresh Fruit Salad',
+        'category': 'Healthy Dessert',
+        'group': 'dessert',
+        'health_status': 'diabetic_friendly',
+        'processed_level': 'unprocessed',
+        'preparation': 'Mix fresh seasonal fruits like strawberries, kiwi, oranges, and blueberries.',
+        'portion': 'One cup (about 150g)',
+        'similarity': 0.95,
+        'nutrition': {
+            'calories': 85,
+            'carbs': 21,
+            'protein': 1,
+            'fats': 0
         }
-    ]
+    },
+    {
+        'name': 'Citrus Fruit Salad',
+        'category': 'Healthy Dessert',
+        'group': 'dessert',
+        'health_status': 'diabetic_friendly',
+        'processed_level': 'unprocessed',
+        'preparation': 'Combine oranges, grapefruit, and mandarin segments with a hint of mint.',
+        'portion': 'One cup (about 150g)',
+        'similarity': 0.90,
+        'nutrition': {
+            'calories': 70,
+            'carbs': 17,
+            'protein': 1,
+            'fats': 0
+        }
+    },
+    {
+        'name': 'Berry Fruit Salad',
+        'category': 'Healthy Dessert',
+        'group': 'dessert',
+        'health_status': 'diabetic_friendly',
+        'processed_level': 'unprocessed',
+        'preparation': 'Mix strawberries, blueberries, raspberries, and blackberries.',
+        'portion': 'One cup (about 150g)',
+        'similarity': 0.85,
+        'nutrition': {
+            'calories': 75,
+            'carbs': 16,
+            'protein': 1,
+            'fats': 0
+        }
+    },
+    {
+        'name': 'Tropical Fruit Salad',
+        'category': 'Healthy Dessert',
+        'group': 'dessert',
+        'health_status': 'diabetic_friendly',
+        'processed_level': 'unprocessed',
+        'preparation': 'Combine pineapple, mango, kiwi, and banana in small portions.',
+        'portion': 'Half cup (about 75g)',
+        'similarity': 0.80,
+        'nutrition': {
+            'calories': 90,
+            'carbs': 23,
+            'protein': 1,
+            'fats': 0
+        }
+    },
+    {
+        'name': 'Yogurt Fruit Salad',
+        'category': 'Healthy Dessert',
+        'group': 'dessert',
+        'health_status': 'diabetic_friendly',
+        'processed_level': 'minimally processed',
+        'preparation': 'Mix fresh fruits with a small amount of plain Greek yogurt and a sprinkle of nuts.',
+        'portion': 'One cup (about 175g)',
+        'similarity': 0.75,
+        'nutrition': {
+            'calories': 120,
+            'carbs': 20,
+            'protein': 7,
+            'fats': 2
+        }
+    }
+]
+
+FRUIT_SALAD_TIPS = [
+    "Fresh fruit salads are naturally sweet and provide essential vitamins, minerals, and fiber",
+    "The fiber in fruit helps slow sugar absorption, making it better for blood glucose control",
+    "Portion control is still important - stick to the recommended serving sizes",
+    "Add nuts or seeds for healthy fats and protein to further reduce glycemic impact",
+    "Avoid adding sugar or honey; use spices like cinnamon or vanilla for extra flavor",
+    "Fruits should ideally be eaten at least 30 minutes to an hour before a meal for better digestion"
+]
+
+# Define handle_dessert_recommendation BEFORE it's called in the recommend function
+def handle_dessert_recommendation(food_name):
+    """Special handling for dessert recommendations - always recommend fruit salad"""
+    if lookup_food(food_name) is None:
+        return jsonify({'type': 'error', 'message': f"Food '{food_name}' not found in database"}), 404
     
-    return jsonify({
+    return jsonify(_fruit_salad_payload(food_name))
+
+def _fruit_salad_payload(food_name):
+    """Build the fruit salad response payload for a dessert"""
+    return {
         'type': 'fruit_salad_alternatives',
         'input': food_name,
         'health_status': 'regular',
         'message': f"Instead of {food_name}, consider these diabetes-friendly fruit salad options:",
-        'recommendations': fruit_salad_recommendations,
-        'fruit_salad_tips': [
-            "Fresh fruit salads are naturally sweet and provide essential vitamins, minerals, and fiber",
-            "The fiber in fruit helps slow sugar absorption, making it better for blood glucose control",
-            "Portion control is still important - stick to the recommended serving sizes",
-            "Add nuts or seeds for healthy fats and protein to further reduce glycemic impact",
-            "Avoid adding sugar or honey; use spices like cinnamon or vanilla for extra flavor",
-            "Fruits should ideally be eaten at least 30 minutes to an hour before a meal for better digestion"
-        ]
-    })
+        'recommendations': FRUIT_SALAD_RECOMMENDATIONS,
+        'fruit_salad_tips': FRUIT_SALAD_TIPS
+    }
 
 # ---------- API Endpoints ----------
 
@@ -283,146 +2036,289 @@ def recommend():
     
     if not food_name:
         return jsonify({'error': 'Missing food parameter'}), 400
+    try:
+        constraints = parse_constraints(data.get('constraints'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     
-    df = service_data['full_df']
-    filtered_df = service_data['filtered_df']
-    features = service_data['features']
+    def build():
+        payload = _recommend_payloads([food_name], constraints=constraints)[0]
+        return payload, 404 if payload['type'] == 'error' else 200
     
-    # Check if food exists in original dataset
-    food_data = df[df['Food Name'].str.lower() == food_name.lower()]
-    if food_data.empty:
-        return jsonify({'type': 'error', 'message': f"Food '{food_name}' not found in database"}), 404
+    return cached_json_response('recommend', f"{food_name}:{constraints!r}", build)
+
+@app.route('/recommend/batch', methods=['POST'])
+def recommend_batch():
+    """Recommendations for several foods in one call; unknown foods get per-item errors"""
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({'error': 'Request body must be a JSON object'}), 400
+    foods = data.get('foods')
     
-    food_idx = food_data.index[0]
-    food_group = food_data.iloc[0]['category_group']
+    if not isinstance(foods, list) or not foods:
+        return jsonify({'error': 'Missing foods list'}), 400
+    if len(foods) > MAX_BATCH_FOODS:
+        return jsonify({'error': f'At most {MAX_BATCH_FOODS} foods per batch'}), 400
     
-    # Special handling for desserts
-    if food_group == 'dessert':
-        return handle_dessert_recommendation(food_name)
+    try:
+        constraints = parse_constraints(data.get('constraints'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     
-    # Regular flow for non-desserts
-    # Check if food is in diabetes-friendly dataset
-    if filtered_df[filtered_df['Food Name'].str.lower() == food_name.lower()].empty:
-        # Food is not diabetes-friendly, recommend alternatives
-        alternatives = get_healthy_alternatives(food_name)
-        
-        if isinstance(alternatives, str):
-            return jsonify({'type': 'error', 'message': alternatives}), 404
+    food_names = [food.strip() if isinstance(food, str) else '' for food in foods]
+    results = _recommend_payloads(food_names, constraints=constraints)
+    with timed_stage('encode'):
+        return jsonify({'results': results, 'count': len(food_names)})
+
+def _recommend_payloads(food_names, top_n=RECOMMENDATION_COUNT, constraints=()):
+    """Build /recommend payloads for a list of foods, scoring each category group in one pass.
+    
+    With `constraints` (from parse_constraints), only foods meeting them count as
+    suitable, and recommendations are ranked within that candidate set.
+    """
+    service = current_service()
+    df = service['full_df']
+    diabetic_mask = service['diabetic_mask']
+    payloads = [None] * len(food_names)
+    
+    # Resolve names and bucket the foods that need scoring by (kind, group)
+    pending = {}
+    fuzzy_matches = {}
+    outside_constraints = set()
+    with timed_stage('lookup'):
+        allowed = candidate_mask(constraints)
+        suitable_mask = diabetic_mask if allowed is None else allowed
+        for slot, food_name in enumerate(food_names):
+            if not food_name:
+                payloads[slot] = {'type': 'error', 'message': 'Missing food parameter'}
+                continue
+            
+            # Check if food exists in original dataset, tolerating typos
+            food_idx, confidence = resolve_food(food_name)
+            if food_idx is None:
+                payloads[slot] = {'type': 'error', 'message': f"Food '{food_name}' not found in database"}
+                continue
+            if confidence < 1.0:
+                fuzzy_matches[slot] = (df.at[food_idx, 'Food Name'], confidence)
+            
+            food_group = df.at[food_idx, 'category_group']
+            
+            # Special handling for desserts
+            if food_group == 'dessert':
+                payloads[slot] = _fruit_salad_payload(food_name)
+                continue
+            
+            kind = 'recommendations' if suitable_mask[food_idx] else 'alternatives'
+            if kind == 'alternatives' and diabetic_mask[food_idx]:
+                outside_constraints.add(slot)
+            pending.setdefault((kind, food_group), []).append((slot, food_idx))
+    
+    for (kind, food_group), items in pending.items():
+        food_indices = [food_idx for _, food_idx in items]
+        with timed_stage('similarity'):
+            if kind == 'alternatives':
+                # Food is not diabetes-friendly, recommend alternatives
+                results = _healthy_alternatives(food_group, food_indices, top_n, allowed)
+            else:
+                # Food is diabetes-friendly, recommend similar foods
+                results = _similar_foods(food_group, food_indices, top_n, allowed)
         
-        return jsonify({
-            'type': 'alternatives',
-            'input': food_name,
-            'health_status': 'regular',
-            'message': 'This food is not ideal for diabetics. Here are some healthy alternatives:',
-            'recommendations': alternatives
-        })
-    else:
-        # Food is diabetes-friendly, recommend similar foods
-        recommendations = get_diabetic_recommendations(food_name)
-        
-        if isinstance(recommendations, str):
-            return jsonify({'type': 'error', 'message': recommendations}), 404
-        
-        return jsonify({
-            'type': 'recommendations',
-            'input': food_name,
-            'health_status': 'diabetic_friendly',
-            'message': 'Good choice! This food is suitable for diabetics. Here are similar options:',
-            'recommendations': recommendations
-        })
+        with timed_stage('format'):
+            _format_payloads(payloads, food_names, kind, items, results)
+    
+    # Diabetes-friendly foods that fall outside the user's constraints
+    for slot in outside_constraints:
+        if payloads[slot]['type'] == 'alternatives':
+            payloads[slot]['health_status'] = 'diabetic_friendly'
+            payloads[slot]['message'] = 'This food does not fit your dietary constraints. Here are some alternatives that do:'
+    
+    # Tell the caller which catalogue food an approximate name resolved to
+    for slot, (matched_name, confidence) in fuzzy_matches.items():
+        if payloads[slot]['type'] != 'error':
+            payloads[slot]['matched_food'] = matched_name
+            payloads[slot]['match_confidence'] = confidence
+    
+    return payloads
 
-def get_diabetic_recommendations(food_name, top_n=5):
+def _format_payloads(payloads, food_names, kind, items, results):
+    """Fill `payloads` slots with formatted recommendations for one scored group."""
+    for (slot, _), result in zip(items, results):
+        food_name = food_names[slot]
+        if isinstance(result, str):
+            payloads[slot] = {'type': 'error', 'message': result}
+        elif kind == 'alternatives':
+            payloads[slot] = {
+                'type': 'alternatives',
+                'input': food_name,
+                'health_status': 'regular',
+                'message': 'This food is not ideal for diabetics. Here are some healthy alternatives:',
+                'recommendations': [_format_recommendation(idx, score) for idx, score in result]
+            }
+        else:
+            payloads[slot] = {
+                'type': 'recommendations',
+                'input': food_name,
+                'health_status': 'diabetic_friendly',
+                'message': 'Good choice! This food is suitable for diabetics. Here are similar options:',
+                'recommendations': [_format_recommendation(idx, score) for idx, score in result]
+            }
+
+def get_diabetic_recommendations(food_name, top_n=RECOMMENDATION_COUNT):
     """Get similar diabetes-friendly food recommendations within the same category group."""
-    df = service_data['full_df']
-    filtered_df = service_data['filtered_df']
-    group_matrices = service_data['group_matrices']
-    group_indices = service_data['group_indices']
-    features = service_data['features']
+    df = current_service()['full_df']
     
     # Find food in filtered dataset
-    matches = filtered_df[filtered_df['Food Name'].str.lower() == food_name.lower()]
-    if matches.empty:
+    food_idx = lookup_food(food_name)
+    if food_idx is None or not current_service()['diabetic_mask'][food_idx]:
         return f"'{food_name}' is not found in diabetes-friendly foods."
     
-    food_idx = matches.index[0]
-    food_group = matches.iloc[0]['category_group']
+    result = _similar_foods(df.at[food_idx, 'category_group'], [food_idx], top_n)[0]
+    if isinstance(result, str):
+        return result
+    return [_format_recommendation(idx, score) for idx, score in result]
+
+def _similar_foods(food_group, food_indices, top_n, allowed=None):
+    """Similar diabetes-friendly foods for several foods of one group, as (index, score) lists.
+    
+    All rows are read with one array operation; the input food itself (rank 0) is skipped.
+    With an `allowed` row mask, only those foods are ranked.
+    """
+    service = current_service()
+    group_indices = service['group_indices']
     
     # Check if we have similarity data for this group
-    if food_group not in group_matrices:
-        return f"Not enough diabetes-friendly {food_group} options for comparison."
+    if food_group not in group_indices:
+        return [f"Not enough diabetes-friendly {food_group} options for comparison."] * len(food_indices)
+    
+    if allowed is not None:
+        return [
+            _similar_within(service, food_group, food_idx, top_n, allowed)
+            or f"No {food_group} foods match your dietary constraints."
+            for food_idx in food_indices
+        ]
     
-    # Get position in the group similarity matrix
-    group_position = list(group_indices[food_group]).index(food_idx)
-    similarity_scores = group_matrices[food_group][group_position]
+    # Positions in the group similarity data
+    positions = [service['group_positions'][food_idx] for food_idx in food_indices]
     
-    # Create (index, score) pairs for all foods in this group
-    all_scores = list(zip(group_indices[food_group], similarity_scores))
+    if food_group in service['group_neighbors']:
+        # Precomputed neighbours are already sorted
+        neighbor_indices, neighbor_scores = service['group_neighbors'][food_group]
+        top_indices = neighbor_indices[positions, 1:top_n + 1]
+        top_scores = neighbor_scores[positions, 1:top_n + 1]
+    else:
+        # Dense matrices: stable descending sort of each row, as a single block
+        similarity_rows = service['group_matrices'][food_group][positions]
+        order = np.argsort(-similarity_rows, axis=1, kind='stable')[:, 1:top_n + 1]
+        top_indices = group_indices[food_group].to_numpy()[order]
+        top_scores = np.take_along_axis(similarity_rows, order, axis=1)
     
-    # Sort by similarity (excluding the food itself)
-    sorted_scores = sorted(all_scores, key=lambda x: x[1], reverse=True)
+    return [list(zip(indices, scores)) for indices, scores in zip(top_indices, top_scores)]
+
+def _similar_within(service, food_group, food_idx, top_n, allowed):
+    """Similar foods for one food, ranked among the `allowed` rows of its group."""
+    position = service['group_positions'][food_idx]
+    labels = service['group_indices'][food_group].to_numpy()
     
-    # Get recommendations (skip first as it's the input food)
-    recommendations = []
-    for idx, score in sorted_scores[1:]:
-        recommendations.append(_format_recommendation(idx, score))
-        if len(recommendations) >= top_n:
-            break
+    if food_group in service['group_neighbors']:
+        # Precomputed neighbours suffice unless the constraints removed too many of them
+        neighbor_indices, neighbor_scores = service['group_neighbors'][food_group]
+        indices, scores = neighbor_indices[position], neighbor_scores[position]
+        keep = allowed[indices] & (indices != food_idx)
+        if keep.sum() >= top_n or len(indices) == len(labels):
+            return list(zip(indices[keep][:top_n], scores[keep][:top_n]))
+        
+        # Otherwise score the whole group, as compute_group_neighbors does
+        scaled_features = StandardScaler().fit_transform(service['feature_matrix'][labels])
+        unit_features = normalize(scaled_features).astype(np.float32)
+        row_scores = unit_features @ unit_features[position]
+    else:
+        row_scores = service['group_matrices'][food_group][position]
     
-    return recommendations
+    candidates = np.flatnonzero(allowed[labels] & (labels != food_idx))
+    order = candidates[np.argsort(-row_scores[candidates], kind='stable')[:top_n]]
+    return list(zip(labels[order], row_scores[order]))
 
-def get_healthy_alternatives(food_name, top_n=5):
+def get_healthy_alternatives(food_name, top_n=RECOMMENDATION_COUNT):
     """Recommend healthy alternatives from the same category group when an unhealthy food is queried."""
-    df = service_data['full_df']
-    filtered_df = service_data['filtered_df']
-    features = service_data['features']
+    df = current_service()['full_df']
     
     # Check if food exists in original dataset
-    food_data = df[df['Food Name'].str.lower() == food_name.lower()]
-    if food_data.empty:
+    food_idx = lookup_food(food_name)
+    if food_idx is None:
         return "Food not found in dataset."
     
-    # Get the category group of the unhealthy food
-    food_idx = food_data.index[0]
-    food_group = df.loc[food_idx, 'category_group']
-    
-    # Filter healthy alternatives from the same category group
-    healthy_alternatives = filtered_df[filtered_df['category_group'] == food_group]
+    result = _healthy_alternatives(df.at[food_idx, 'category_group'], [food_idx], top_n)[0]
+    if isinstance(result, str):
+        return result
+    return [_format_recommendation(idx, score) for idx, score in result]
+
+def _healthy_alternatives(food_group, food_indices, top_n, allowed=None):
+    """Healthy alternatives for several foods of one group, as (index, score) lists.
     
-    if healthy_alternatives.empty:
-        return f"No healthy alternatives found in the '{food_group}' category."
+    With an `allowed` row mask, only those foods are offered as alternatives.
+    """
+    service = current_service()
+    df = service['full_df']
+    features = service['features']
     
-    # Calculate similarity between unhealthy food and healthy alternatives
-    # Prepare features for similarity calculation
-    unhealthy_features = food_data[features].fillna(0).values
-    healthy_features = healthy_alternatives[features].fillna(0).values
+    # Healthy alternatives from the same category group
+    if food_group not in service['alternative_candidates']:
+        return [f"No healthy alternatives found in the '{food_group}' category."] * len(food_indices)
     
-    # Normalize all features together
-    all_features = np.vstack([unhealthy_features, healthy_features])
-    scaler = StandardScaler()
-    scaled_features = scaler.fit_transform(all_features)
+    if allowed is not None:
+        return [
+            _alternatives_within(service, food_group, food_idx, top_n, allowed)
+            or f"No {food_group} foods match your dietary constraints."
+            for food_idx in food_indices
+        ]
     
-    # Separate back into unhealthy and healthy
-    unhealthy_scaled = scaled_features[0].reshape(1, -1)
-    healthy_scaled = scaled_features[1:]
+    food_indices = np.asarray(food_indices)
+    top_indices = service['alternative_indices'][food_indices, :top_n]
+    top_scores = service['alternative_scores'][food_indices, :top_n]
     
-    # Calculate similarity
-    similarities = cosine_similarity(unhealthy_scaled, healthy_scaled)[0]
+    # Diabetes-friendly foods are not precomputed; score them against the group now
+    missing = top_indices[:, 0] < 0
+    if missing.any():
+        candidate_labels, candidate_features = service['alternative_candidates'][food_group]
+        query_features = df.loc[food_indices[missing], features].fillna(0).to_numpy(dtype=np.float64)
+        similarities = _alternative_scores(query_features, candidate_features)
+        order = np.argsort(-similarities, axis=1, kind='stable')[:, :top_n]
+        live_indices = np.full((len(order), top_indices.shape[1]), -1, dtype=np.int32)
+        live_scores = np.zeros((len(order), top_indices.shape[1]), dtype=np.float32)
+        live_indices[:, :order.shape[1]] = candidate_labels[order]
+        live_scores[:, :order.shape[1]] = np.take_along_axis(similarities, order, axis=1)
+        top_indices[missing] = live_indices
+        top_scores[missing] = live_scores
     
-    # Create (index, score) pairs and sort
-    alternatives = list(zip(healthy_alternatives.index, similarities))
-    alternatives.sort(key=lambda x: x[1], reverse=True)
+    # Unused slots are -1 when the group has fewer than top_n healthy foods
+    return [
+        [(idx, score) for idx, score in zip(indices, scores) if idx >= 0]
+        for indices, scores in zip(top_indices, top_scores)
+    ]
+
+def _alternatives_within(service, food_group, food_idx, top_n, allowed):
+    """Healthy alternatives for one food, ranked among the `allowed` candidates of its group."""
+    candidate_labels, candidate_features = service['alternative_candidates'][food_group]
+    indices = service['alternative_indices'][food_idx]
+    scores = service['alternative_scores'][food_idx]
     
-    # Format results
-    results = []
-    for idx, score in alternatives[:top_n]:
-        results.append(_format_recommendation(idx, score))
+    # Precomputed alternatives suffice unless the constraints removed too many of them
+    if indices[0] >= 0:
+        keep = (indices >= 0) & allowed[np.maximum(indices, 0)]
+        if keep.sum() >= top_n or (indices >= 0).sum() == len(candidate_labels):
+            return list(zip(indices[keep][:top_n], scores[keep][:top_n]))
     
-    return results
+    # Score against every candidate so the ranking matches the precomputed one
+    similarities = _alternative_scores(service['feature_matrix'][[food_idx]], candidate_features)[0]
+    candidates = np.flatnonzero(allowed[candidate_labels])
+    order = candidates[np.argsort(-similarities[candidates], kind='stable')[:top_n]]
+    return list(zip(candidate_labels[order], similarities[order]))
 
 def _format_recommendation(idx, score=None):
     """Format a recommendation for output"""
-    df = service_data['full_df']
-    filtered_df = service_data['filtered_df']
+    service = current_service()
+    df = service['full_df']
+    filtered_df = service['filtered_df']
     
     if idx in filtered_df.index:
         food = filtered_df.loc[idx]
@@ -465,50 +2361,316 @@ def _format_recommendation(idx, score=None):
         }
     }
 
-# ---------- OCR Endpoint (unchanged) ----------
+# ---------- OCR Endpoint ----------
 
 @app.route("/ocr", methods=["POST"])
 def process_image():
-    if "file" not in request.files:
+    data = _read_upload()
+    if data is None:
         return jsonify({"error": "No file uploaded"}), 400
     
-    file = request.files["file"]
-    file_path = os.path.join(UPLOAD_FOLDER, file.filename)
-    
     try:
-        file.save(file_path)
-        results = ocr.ocr(file_path, cls=True)
-        extracted_text = "\n".join([line[1][0] for res in results for line in res])
-        os.remove(file_path)
-        return jsonify({"text": extracted_text})
+        stream_format = _ocr_stream_format()
+        grayscale = _form_flag('grayscale', OCR_GRAYSCALE)
+        contrast = _form_flag('contrast', OCR_CONTRAST)
+        use_angle_cls = _form_flag('angle_cls', OCR_ANGLE_CLS)
+        
+        # Repeated uploads of the same image (with the same options) are answered from the cache
+        with timed_stage('cache'):
+            salt = f"paddleocr-en:{OCR_IMAGE_MAX_SIDE}:{grayscale:d}{contrast:d}{use_angle_cls:d}"
+            cache_key = ResultCache.content_key(data, salt)
+            cached = result_cache.get("ocr", cache_key)
+        if cached is not None:
+            if stream_format is not None:
+                # Replay the cached pages as a stream
+                texts = [page.get("text") for page in cached["pages"]] if "pages" in cached else [cached["text"]]
+                return _ocr_stream_response(iter(enumerate(texts)), len(texts), stream_format)
+            return jsonify(cached)
+        
+        with timed_stage('decode'):
+            document = open_document(data)
+        
+        if document is None and stream_format is None:
+            # Single image: decode straight from the upload bytes
+            with timed_stage('decode'):
+                image = prepare_image(data, OCR_IMAGE_MAX_SIDE, grayscale, contrast)
+            with timed_stage('inference'):
+                extracted_text = ocr_text(image, use_angle_cls)
+            
+            response = {"text": extracted_text}
+            result_cache.put("ocr", cache_key, response)
+            with timed_stage('encode'):
+                return jsonify(response)
+        
+        single_image = document is None
+        if single_image:
+            document = (1, lambda index: data, lambda: None)
+        if document[0] > OCR_MAX_PAGES:
+            document[2]()
+            return jsonify({"error": f"Documents are limited to {OCR_MAX_PAGES} pages"}), 413
+        
+        pages = ocr_pages(document, grayscale, contrast, use_angle_cls)
+        if stream_format is not None:
+            return _ocr_stream_response(pages, document[0], stream_format, cache_key, single_image)
+        
+        # Whole document in one response: pages still run concurrently
+        with timed_stage('inference'):
+            texts = [None] * document[0]
+            for index, text in pages:
+                texts[index] = text
+        response = _ocr_document_result(texts)
+        if all(text is not None for text in texts):
+            result_cache.put("ocr", cache_key, response)
+        with timed_stage('encode'):
+            return jsonify(response)
+    except UnsupportedDocument as e:
+        return jsonify({"error": str(e)}), 415
     except Exception as e:
         return jsonify({"error": "OCR processing failed"}), 500
 
 
+def _ocr_stream_format():
+    """'ndjson' or 'sse' when the client asked for per-page streaming (?stream= or Accept), else None."""
+    requested = request.args.get('stream', '').strip().lower()
+    if requested in ('ndjson', 'sse'):
+        return requested
+    accept = request.headers.get('Accept', '')
+    if 'text/event-stream' in accept:
+        return 'sse'
+    if 'application/x-ndjson' in accept:
+        return 'ndjson'
+    return None
+
+
+def _ocr_document_result(texts):
+    """Combined text plus per-page entries for a multi-page OCR result."""
+    return {
+        "text": "\n\n".join(text for text in texts if text),
+        "pages": [
+            {"page": index + 1, "text": text} if text is not None
+            else {"page": index + 1, "error": "OCR processing failed"}
+            for index, text in enumerate(texts)
+        ]
+    }
+
+
+def _ocr_stream_response(pages, page_count, stream_format, cache_key=None, single_image=False):
+    """Stream one chunk per page as it finishes, then a final chunk with the combined text.
+    
+    With `cache_key`, a fully successful result is cached in the shape a non-streaming
+    request would have returned.
+    """
+    def chunk(event, payload):
+        body = json.dumps(payload)
+        if stream_format == 'sse':
+            return f"event: {event}\ndata: {body}\n\n"
+        return body + "\n"
+    
+    def generate():
+        texts = [None] * page_count
+        for index, text in pages:
+            texts[index] = text
+            page = {"page": index + 1, "pages": page_count}
+            page.update({"text": text} if text is not None else {"error": "OCR processing failed"})
+            yield chunk('page', page)
+        
+        result = _ocr_document_result(texts)
+        if cache_key and all(text is not None for text in texts):
+            result_cache.put("ocr", cache_key, {"text": result["text"]} if single_image else result)
+        yield chunk('done', {"done": True, "pages": page_count, "text": result["text"]})
+    
+    mimetype = 'text/event-stream' if stream_format == 'sse' else 'application/x-ndjson'
+    # No proxy buffering, so each page reaches the client as soon as it is written
+    return app.response_class(stream_with_context(generate()), mimetype=mimetype,
+                              headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+def _read_upload():
+    """The uploaded "file" as bytes, or None when there is none.
+    
+    The first access to request.files parses (and spools) the whole multipart body,
+    so that access is what the upload stage times, not just the final read.
+    """
+    with timed_stage('upload'):
+        upload = request.files.get("file")
+        return upload.read() if upload is not None else None
+
+
+def _form_flag(name, default):
+    """Read an on/off form field, falling back to `default` when it is absent."""
+    value = request.form.get(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ('1', 'true', 'yes', 'on')
+
+
 # In your Flask app (app.py)
 @app.route("/detect-food", methods=["POST"])
 def detect_food():
-    if "file" not in request.files:
+    data = _read_upload()
+    if data is None:
         return jsonify({"error": "No file uploaded"}), 400
     
     try:
-        file = request.files["file"]
-        image = Image.open(file.stream).convert("RGB")
-        results = yolo_model.predict(image)
+        body, status = _detect_food_response(data)
+        with timed_stage('encode'):
+            return jsonify(body), status
         
-        if not results[0].boxes or len(results[0].boxes.cls) == 0:
-            return jsonify({"error": "No food items detected"}), 400
-            
-        labels = [results[0].names[cls.item()] for cls in results[0].boxes.cls]
-        return jsonify({
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+def _detect_food_response(data):
+    """Run (or fetch cached) detection on raw image bytes; returns (body, status)."""
+    # Repeated uploads of the same image are answered from the cache
+    with timed_stage('cache'):
+        model_id = f"{YOLO_WEIGHTS}:{YOLO_BACKEND}{':int8' if YOLO_INT8 else ''}:{DETECT_IMAGE_SIZE}"
+        cache_key = ResultCache.content_key(data, f"{model_id}:boxes")
+        cached = result_cache.get("detect", cache_key)
+    if cached is not None:
+        return cached["body"], cached["status"]
+    
+    with timed_stage('decode'):
+        image = prepare_image(data, DETECT_IMAGE_SIZE)
+    with timed_stage('inference'):
+        # Includes time spent waiting for the batch window
+        result = detection_batcher.submit(image)
+    
+    if not result.boxes or len(result.boxes.cls) == 0:
+        body, status = {"error": "No food items detected"}, 400
+    else:
+        with timed_stage('labels'):
+            classes = result.boxes.cls.cpu().numpy().astype(int)
+            labels = [result.names[cls] for cls in classes]
+            confidences = np.round(result.boxes.conf.cpu().numpy().astype(float), 4)
+            # Corners as fractions of the image width and height
+            boxes = np.round(result.boxes.xyxyn.cpu().numpy().astype(float), 4)
+        body, status = {
             "detections": labels,
+            "confidences": confidences.tolist(),
+            "boxes": boxes.tolist(),
             "count": len(labels),
             "primary_item": labels[0]  # Most confident detection
-        })
-        
+        }, 200
+    
+    result_cache.put("detect", cache_key, {"body": body, "status": status})
+    return body, status
+
+
+@app.route("/detect-nutrition", methods=["POST"])
+def detect_nutrition():
+    """Detect the foods on a plate, estimate each portion from its box and total the nutrition in one call"""
+    data = _read_upload()
+    if data is None:
+        return jsonify({"error": "No file uploaded"}), 400
+    
+    try:
+        body, status = _detect_food_response(data)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
+    if status != 200:
+        return jsonify(body), status
+    
+    with timed_stage('lookup'):
+        plate = analyze_detections(body["detections"], body["confidences"], body["boxes"])
+    
+    with timed_stage('encode'):
+        return jsonify({**body, **plate})
+
+
+def estimate_portions(boxes):
+    """Servings per detection from normalized [x1, y1, x2, y2] boxes, relative to the largest box"""
+    boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+    areas = np.clip(boxes[:, 2] - boxes[:, 0], 0, None) * np.clip(boxes[:, 3] - boxes[:, 1], 0, None)
+    if not len(areas) or areas.max() <= 0:
+        return np.ones(len(areas))
+    
+    portions = np.clip(areas / areas.max(), PLATE_PORTION_MIN, 1.0)
+    return np.maximum(np.round(portions / PLATE_PORTION_STEP) * PLATE_PORTION_STEP, PLATE_PORTION_MIN)
+
+
+def analyze_detections(labels, confidences, boxes):
+    """Per-food and plate-total nutrition for one image's detections.
+    
+    Items are one per distinct label, in detection order: `nutrition` is the catalogue
+    entry per serving, `servings` the summed portions of that label's detections and
+    `plate_nutrition` their scaled nutrients. The nutrient rows of every matched
+    detection are gathered from the feature matrix and scaled in one step. `totals`
+    covers matched foods only; `totals.complete` is false when any label is missing.
+    """
+    service = current_service()
+    portions = estimate_portions(boxes)
+    
+    distinct = list(dict.fromkeys(labels))
+    resolved = [resolve_food(label) for label in distinct]
+    label_ids = np.array([distinct.index(label) for label in labels], dtype=np.int64)
+    found = np.array([resolved[label_id][0] is not None for label_id in label_ids], dtype=bool)
+    rows = np.array([resolved[label_id][0] for label_id in label_ids[found]], dtype=np.int64)
+    
+    features = service['features']
+    columns = [features.index(column) for column in PLATE_NUTRIENTS.values()]
+    feature_matrix = np.asarray(service['feature_matrix'])
+    nutrients = feature_matrix[rows][:, columns] * portions[found][:, None]
+    per_label = np.zeros((len(distinct), len(columns)))
+    np.add.at(per_label, label_ids[found], nutrients)
+    servings = np.bincount(label_ids, weights=portions, minlength=len(distinct))
+    
+    # A mixed meal's GI is the carbohydrate-weighted mean of its parts
+    gi = feature_matrix[rows, features.index('GI')]
+    carbs = nutrients[:, list(PLATE_NUTRIENTS).index('carbs')]
+    plate_gi = float(np.dot(gi, carbs) / carbs.sum()) if carbs.sum() > 0 else None
+    
+    items = []
+    missing = []
+    for label_id, (label, (food_idx, match_confidence)) in enumerate(zip(distinct, resolved)):
+        item = {
+            "label": label,
+            "count": int((label_ids == label_id).sum()),
+            "found": food_idx is not None,
+            "servings": float(servings[label_id]),
+            "detections": [
+                {"confidence": confidences[i], "box": boxes[i], "portion": float(portions[i])}
+                for i in np.flatnonzero(label_ids == label_id)
+            ],
+            "nutrition": None
+        }
+        if food_idx is None:
+            missing.append(label)
+        else:
+            item["nutrition"] = _nutrition_payload(food_idx)
+            if match_confidence < 1.0:
+                item["nutrition"]["match_confidence"] = match_confidence
+            item["plate_nutrition"] = {key: round(float(value), 2) for key, value in zip(PLATE_NUTRIENTS, per_label[label_id])}
+        items.append(item)
+    
+    totals = {key: round(float(value), 2) for key, value in zip(PLATE_NUTRIENTS, per_label.sum(axis=0))}
+    totals["glycemic_index"] = round(plate_gi, 1) if plate_gi is not None else None
+    totals["complete"] = not missing
+    return {"items": items, "totals": totals, "missing": missing}
+
+
+@app.route("/detect-food/stats", methods=["GET"])
+def detect_food_stats():
+    """Detection queue depth and batch-size statistics"""
+    return jsonify(detection_batcher.stats())
+
+
+@app.route("/cache/stats", methods=["GET"])
+def cache_stats():
+    """Result, response and candidate cache hit, miss and size statistics"""
+    return jsonify({
+        'results': result_cache.stats(),
+        'responses': response_cache.stats(),
+        'candidates': candidate_cache.stats()
+    })
+
 
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Latency histograms and counters in Prometheus text format"""
+    if not METRICS_ENABLED:
+        return jsonify({'error': 'Metrics are disabled (METRICS_ENABLED=0)'}), 404
+    return app.response_class(render_metrics(), mimetype='text/plain; version=0.0.4')
 
 
 @app.route('/food-nutrition', methods=['POST'])
@@ -518,19 +2680,28 @@ def food_nutrition():
     if not food_name:
         return jsonify({'error': 'Missing food_name'}), 400
 
-    # Get the preloaded DataFrame
-    df = service_data['full_df']
-    
-    # Case-insensitive search with whitespace handling
-    food_row = df[df['Food Name'].str.strip().str.lower() == food_name]
-    
-    if food_row.empty:
-        return jsonify({'error': f'Nutrition info not found for {food_name}'}), 404
+    def build():
+        # Case-insensitive lookup, falling back to a typo-tolerant match
+        with timed_stage('lookup'):
+            food_idx, confidence = resolve_food(food_name)
+        
+        if food_idx is None:
+            return {'error': f'Nutrition info not found for {food_name}'}, 404
+
+        nutrition = _nutrition_payload(food_idx)
+        if confidence < 1.0:
+            nutrition['match_confidence'] = confidence
+        return nutrition, 200
 
-    food = food_row.iloc[0]
+    return cached_json_response('food-nutrition', food_name, build)
+
+
+def _nutrition_payload(food_idx):
+    """Map a catalogue row to the /food-nutrition response fields"""
+    food = current_service()['full_df'].loc[food_idx]
     
     # Map all CSV columns to API response
-    nutrition = {
+    return {
         'food_name': food['Food Name'].strip(),
         'category': food['Category'],
         'calories': int(food['Calories']),
@@ -545,7 +2716,102 @@ def food_nutrition():
         'recommendation': food['recommendation']
     }
 
-    return jsonify(nutrition)
+
+@app.route('/search-foods', methods=['GET'])
+def search_foods():
+    """Autocomplete and typo-tolerant search over catalogue food names"""
+    query = request.args.get('q', '').strip()
+    limit = min(request.args.get('limit', 10, type=int), 50)
+    if not query:
+        return jsonify({'error': 'Missing q parameter'}), 400
+    
+    df = current_service()['full_df']
+    
+    # Prefix completions first, then fill with approximate matches
+    results = [(idx, 1.0, 'prefix') for idx in prefix_search(query, limit)]
+    seen = {idx for idx, _, _ in results}
+    for idx, score in fuzzy_search(query, limit):
+        if len(results) >= limit:
+            break
+        if idx not in seen:
+            seen.add(idx)
+            results.append((idx, score, 'fuzzy'))
+    
+    return jsonify({
+        'query': query,
+        'results': [
+            {
+                'food_name': df.at[idx, 'Food Name'].strip(),
+                'category': df.at[idx, 'Category'],
+                'score': score,
+                'match': match
+            }
+            for idx, score, match in results
+        ]
+    })
+
+
+@app.route('/meal-plan', methods=['POST'])
+def meal_plan():
+    """Assemble a day of diabetes-friendly meals close to calorie/macro targets within a GL budget"""
+    data = request.get_json(silent=True)
+    if not data:
+        return jsonify({'error': 'Missing request body'}), 400
+    if not isinstance(data, dict):
+        return jsonify({'error': 'Request body must be a JSON object'}), 400
+    try:
+        options = parse_meal_plan_request(data)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    def build():
+        with timed_stage('search'):
+            plan = plan_meals(**options)
+        if plan is None:
+            return {'error': 'No meal plan fits the glycemic load budget'}, 422
+        return {**plan, 'targets': options['targets'], 'max_gl': options['max_gl']}, 200
+    
+    # Search time depends on load, so only plans proven optimal are repeatable; a plan
+    # cut short by the time budget (or a 422 from one) is recomputed on the next request
+    return cached_json_response('meal-plan', json.dumps(options, sort_keys=True), build,
+                                cacheable=lambda payload, status: status == 200 and payload['complete'])
+
+
+@app.route('/admin/reload-catalogue', methods=['POST'])
+def admin_reload_catalogue():
+    """Reload the food catalogue without restarting the service"""
+    if not ADMIN_TOKEN:
+        return jsonify({'error': 'Catalogue reload is disabled (ADMIN_TOKEN not set)'}), 403
+    if PREFORK_SERVER and CATALOGUE_WATCH_INTERVAL <= 0:
+        # This request reaches one worker; the others only reload through their watchers
+        return jsonify({'error': 'Under a pre-fork server, catalogue reloads need CATALOGUE_WATCH_INTERVAL'}), 409
+    if not hmac.compare_digest(request.headers.get('X-Admin-Token', '').encode(), ADMIN_TOKEN.encode()):
+        return jsonify({'error': 'Invalid admin token'}), 403
+    
+    ok, message = reload_catalogue()
+    if not ok:
+        return jsonify({'error': message}), 500
+    return jsonify({'message': message, 'foods': len(service_data['full_df'])})
+
+
+@app.route('/ready', methods=['GET'])
+def ready():
+    """Readiness probe: reports which components are loaded."""
+    components = {'catalogue': service_data is not None}
+    for name in MODEL_LOADERS:
+        components[name] = name in _models
+    
+    # In lazy mode models load on demand, so only the catalogue gates readiness;
+    # otherwise so do the PRELOAD_MODELS (other models load lazily on first use)
+    required = ['catalogue'] if MODEL_LOADING == 'lazy' else ['catalogue'] + PRELOAD_MODELS
+    is_ready = all(components[name] for name in required)
+    
+    return jsonify({
+        'ready': is_ready,
+        'mode': MODEL_LOADING,
+        'components': components,
+        'errors': dict(_model_errors)
+    }), 200 if is_ready else 503
 
 
 # ---------- Error Handling ----------
@@ -0,0 +1,31 @@
+"""Image pre-processing shared by ocr_server.py and detect.py."""
+import io
+from PIL import Image, ImageOps
+
+def prepare_image(source, max_side=0, grayscale=False, contrast=False):
+    """Decode image bytes (or a file path, or an opened image) into an upright RGB image sized for inference.
+
+    The EXIF orientation is applied. With `max_side`, the image is shrunk so its longest
+    side fits; JPEGs are first decoded at a reduced scale (draft mode), so a phone photo
+    is never held in memory at full resolution. `grayscale` and `contrast` (autocontrast)
+    help OCR on faint or unevenly lit scans.
+    """
+    if isinstance(source, Image.Image):
+        image = source
+    else:
+        image = Image.open(io.BytesIO(source) if isinstance(source, bytes) else source)
+
+    if max_side and max(image.size) > max_side and image.format == 'JPEG':
+        # Only picks a decoder scale that keeps both sides at or above the target
+        scale = max_side / max(image.size)
+        image.draft('RGB', (max(1, int(image.width * scale)), max(1, int(image.height * scale))))
+
+    image = ImageOps.exif_transpose(image)
+    image = image.convert('L' if grayscale else 'RGB')
+    if max_side and max(image.size) > max_side:
+        image.thumbnail((max_side, max_side))
+    if contrast:
+        image = ImageOps.autocontrast(image, cutoff=1)
+
+    # Models expect three channels even for grayscale input
+    return image if image.mode == 'RGB' else image.convert('RGB')
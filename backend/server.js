@@ -912,7 +912,7 @@ async function simplifyText(text) {
 // Add this route
 app.post("/api/generate-meal-plan", async (req, res) => {
   try {
-    const { food } = req.body;
+    const { food, constraints } = req.body;
     if (!food) {
       return res.status(400).json({ error: "Food name is required" });
     }
@@ -921,7 +921,8 @@ app.post("/api/generate-meal-plan", async (req, res) => {
     const flaskUrl = process.env.FLASK_API_URL || "https://8b97-2409-40c1-4148-34be-2483-f1e-cbf5-b991.ngrok-free.app/recommend";
 
     // Call the Flask microservice
-    const response = await axios.post(flaskUrl, { food });
+    // Optional per-user constraints, e.g. { diet: "vegan", max_sodium: 400, max_gl: 8 }
+    const response = await axios.post(flaskUrl, { food, constraints });
 
     // Forward the response to the frontend
     res.json(response.data);
@@ -931,6 +932,28 @@ app.post("/api/generate-meal-plan", async (req, res) => {
   }
 });
 
+// Day meal plan for calorie/macro targets and a glycemic load budget, e.g.
+// { targets: { calories, protein, carbs, fats, fiber }, max_gl, constraints }
+app.post("/api/meal-plan", async (req, res) => {
+  try {
+    const { targets, max_gl, constraints, slots } = req.body;
+    if (!targets || !targets.calories) {
+      return res.status(400).json({ error: "Calorie target is required" });
+    }
+
+    const flaskUrl = process.env.FLASK_MEAL_PLAN_URL || "https://8b97-2409-40c1-4148-34be-2483-f1e-cbf5-b991.ngrok-free.app/meal-plan";
+    const response = await axios.post(flaskUrl, { targets, max_gl, constraints, slots });
+
+    res.json(response.data);
+  } catch (error) {
+    if (error.response) {
+      return res.status(error.response.status).json(error.response.data);
+    }
+    console.error("Flask meal plan error:", error.message || error);
+    res.status(500).json({ error: "Failed to generate meal plan" });
+  }
+});
+
 
 
 app.post("/upload", upload.single("file"), async (req, res) => {
@@ -946,9 +969,9 @@ app.post("/upload", upload.single("file"), async (req, res) => {
       contentType: req.file.mimetype
     });
 
-    // 1. Get detection from Flask
+    // 1. Detect every item on the plate, with portions and nutrition, in a single Flask call
     const detectionResponse = await axios.post(
-      "https://8b97-2409-40c1-4148-34be-2483-f1e-cbf5-b991.ngrok-free.app/detect-food",
+      "https://8b97-2409-40c1-4148-34be-2483-f1e-cbf5-b991.ngrok-free.app/detect-nutrition",
       flaskFormData,
       {
         headers: flaskFormData.getHeaders(),
@@ -964,34 +987,45 @@ app.post("/upload", upload.single("file"), async (req, res) => {
     const detectedFood = detectionResponse.data.primary_item;
     console.log("✅ Detected food:", detectedFood);
 
-    // 2. Get nutrition data
-    const nutritionResponse = await axios.post(
-      "https://8b97-2409-40c1-4148-34be-2483-f1e-cbf5-b991.ngrok-free.app/food-nutrition",
-      { food_name: detectedFood }
-    );
-
-    // 3. Handle response
-    let macros;
-    if (nutritionResponse.data?.error) {
-      // Dataset lookup failed, use LLM fallback
-      console.log("⚠️ Dataset lookup failed, using LLM fallback");
-      macros = await queryLLM(detectedFood);
-    } else {
-      // Map dataset fields to expected frontend structure
-      macros = {
-        source: "dataset",
-        calories: nutritionResponse.data.calories,
-        protein: nutritionResponse.data.protein,
-        carbs: nutritionResponse.data.carbs,
-        fat: nutritionResponse.data.fat, // CSV uses 'Fats' column
-        fiber: nutritionResponse.data.fiber,
-        glycemic_index: nutritionResponse.data.gi // CSV uses 'GI' column
-      };
-    }
+    // 2. Per-item nutrition: dataset where found, LLM fallback (per serving, scaled) for the rest
+    const fields = ["calories", "protein", "carbs", "fat", "fiber"];
+    const items = await Promise.all((detectionResponse.data.items || []).map(async (item) => {
+      if (item.found) {
+        return {
+          label: item.label,
+          servings: item.servings,
+          source: "dataset",
+          ...item.plate_nutrition,
+          glycemic_index: item.nutrition.glycemic_index
+        };
+      }
+      console.log(`⚠️ Dataset lookup failed for ${item.label}, using LLM fallback`);
+      const perServing = await queryLLM(item.label);
+      const scaled = { label: item.label, servings: item.servings, source: perServing.source };
+      fields.forEach((field) => {
+        scaled[field] = perServing[field] == null ? null : perServing[field] * item.servings;
+      });
+      scaled.glycemic_index = perServing.glycemic_index;
+      return scaled;
+    }));
+
+    // 3. Whole-plate totals; partial when any item has no nutrition from either source
+    const macros = { partial: items.some((item) => item.calories == null) };
+    fields.forEach((field) => {
+      macros[field] = Math.round(items.reduce((sum, item) => sum + (item[field] || 0), 0) * 10) / 10;
+    });
+    macros.calories = Math.round(macros.calories);
+    const carbs = items.reduce((sum, item) => sum + (item.glycemic_index != null ? item.carbs || 0 : 0), 0);
+    macros.glycemic_index = carbs > 0
+      ? Math.round(items.reduce((sum, item) => sum + (item.glycemic_index != null ? item.glycemic_index * (item.carbs || 0) : 0), 0) / carbs)
+      : null;
+    const sources = [...new Set(items.map((item) => item.source))];
+    macros.source = sources.length === 1 ? sources[0] : "mixed";
 
     res.json({
-      detected_food: detectedFood,
-      macros
+      detected_food: items.map((item) => item.label).join(", ") || detectedFood,
+      macros,
+      items
     });
 
   } catch (error) {
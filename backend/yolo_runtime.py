@@ -0,0 +1,266 @@
+"""YOLO inference runtimes shared by ocr_server.py and detect.py.
+
+The detector runs either as the PyTorch weights (best.pt) or as a CPU-optimised export
+of them: ONNX Runtime ('onnx') or OpenVINO ('openvino'), optionally quantised to INT8.
+Exports are written next to the weights with the names ultralytics uses and rebuilt
+when the weights are newer. INT8 calibration uses a directory of sample food photos.
+
+    python yolo_runtime.py export --backend openvino --int8 --calibration photos/
+    python yolo_runtime.py check --backend openvino --int8 --calibration photos/ held_out/
+
+`check` runs the PyTorch model and the export over the same images and reports label
+agreement and per-image latency; it exits non-zero below --min-agreement. For INT8 the
+checked images should be held out from calibration, or the agreement is optimistic.
+
+The onnx backend needs onnxruntime; openvino needs openvino, plus nncf for INT8.
+Export in advance when several server workers start at once, so they do not race.
+"""
+import os
+import sys
+import glob
+import time
+import shutil
+import logging
+import argparse
+import contextlib
+import numpy as np
+from PIL import Image
+from preprocess import prepare_image
+
+BACKENDS = ('pytorch', 'onnx', 'openvino')
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.webp', '.tif', '.tiff')
+CALIBRATION_IMAGES = 300  # Samples used to calibrate INT8 activation ranges
+
+def exported_path(weights, backend, int8=False):
+    """Where the export of `weights` for `backend` lives (a file for onnx, a directory for openvino)."""
+    stem = os.path.splitext(weights)[0] + ('_int8' if int8 else '')
+    return stem + '.onnx' if backend == 'onnx' else stem + '_openvino_model'
+
+def _is_fresh(path, weights):
+    return os.path.exists(path) and os.path.getmtime(path) >= os.path.getmtime(weights)
+
+@contextlib.contextmanager
+def _output_to_stderr():
+    """Send prints and ultralytics log lines to stderr, so stdout carries only results
+    (detect.py --serve speaks NDJSON on it)."""
+    from ultralytics.utils import LOGGER  # Its handler holds on to sys.stdout from import time
+    handlers = [handler for handler in LOGGER.handlers
+                if isinstance(handler, logging.StreamHandler) and handler.stream is sys.stdout]
+    for handler in handlers:
+        handler.setStream(sys.stderr)
+    try:
+        with contextlib.redirect_stdout(sys.stderr):
+            yield
+    finally:
+        for handler in handlers:
+            handler.setStream(sys.stdout)
+
+def export_model(weights, backend, int8=False, image_size=640, calibration_dir=None):
+    """Build (or reuse) the export of `weights` for `backend` and return its path."""
+    if backend not in BACKENDS or backend == 'pytorch':
+        raise ValueError(f"Cannot export to backend '{backend}'; expected 'onnx' or 'openvino'")
+    target = exported_path(weights, backend, int8)
+    if _is_fresh(target, weights):
+        return target
+
+    with _output_to_stderr():
+        fp32 = exported_path(weights, backend)
+        if not _is_fresh(fp32, weights):
+            from ultralytics import YOLO
+            print(f"Exporting {weights} to {backend}...")
+            # Dynamic input shapes so batched predict calls work with any batch size
+            YOLO(weights).export(format=backend, imgsz=image_size, dynamic=True)
+        if not int8:
+            return fp32
+
+        if not calibration_dir:
+            raise ValueError("INT8 export needs a calibration directory of sample images")
+        samples = calibration_samples(calibration_dir, image_size)
+        print(f"Quantising {fp32} to INT8 with {len(samples)} calibration images...")
+        if backend == 'onnx':
+            _quantize_onnx(fp32, target, samples)
+        else:
+            _quantize_openvino(fp32, target, samples)
+        return target
+
+def _letterbox(image, size):
+    """Resize to fit a size x size square, padded like the YOLO predictor, as a 1x3xHxW float array."""
+    scale = min(size / image.width, size / image.height)
+    resized = image.resize((max(1, round(image.width * scale)), max(1, round(image.height * scale))), Image.BILINEAR)
+    canvas = Image.new('RGB', (size, size), (114, 114, 114))
+    canvas.paste(resized, ((size - resized.width) // 2, (size - resized.height) // 2))
+    return (np.asarray(canvas, dtype=np.float32) / 255.0).transpose(2, 0, 1)[None]
+
+def _image_paths(directory):
+    return sorted(
+        path for path in glob.glob(os.path.join(directory, '**', '*'), recursive=True)
+        if path.lower().endswith(IMAGE_EXTENSIONS)
+    )
+
+def calibration_samples(directory, image_size, limit=CALIBRATION_IMAGES):
+    """Model-ready input arrays for up to `limit` images under `directory`."""
+    paths = _image_paths(directory)[:limit]
+    if not paths:
+        raise ValueError(f"No images found in {directory}")
+    return [_letterbox(prepare_image(path, image_size), image_size) for path in paths]
+
+def _quantize_onnx(source, target, samples):
+    import onnx
+    from onnxruntime.quantization import CalibrationDataReader, QuantFormat, QuantType, quantize_static
+
+    class Samples(CalibrationDataReader):
+        def __init__(self, input_name):
+            self.batches = iter({input_name: sample} for sample in samples)
+
+        def get_next(self):
+            return next(self.batches, None)
+
+    model = onnx.load(source)
+    quantize_static(
+        source, target, Samples(model.graph.input[0].name),
+        quant_format=QuantFormat.QDQ, per_channel=True,
+        activation_type=QuantType.QUInt8, weight_type=QuantType.QInt8
+    )
+
+    # Keep the class names and input size ultralytics reads from the model metadata
+    quantized = onnx.load(target)
+    del quantized.metadata_props[:]
+    quantized.metadata_props.extend(model.metadata_props)
+    onnx.save(quantized, target)
+
+def _quantize_openvino(source, target, samples):
+    import nncf
+    import openvino as ov
+
+    xml = glob.glob(os.path.join(source, '*.xml'))[0]
+    model = ov.Core().read_model(xml)
+    quantized = nncf.quantize(
+        model, nncf.Dataset(samples), preset=nncf.QuantizationPreset.MIXED,
+        # The detection head decodes boxes; quantising it costs accuracy for little speed
+        ignored_scope=nncf.IgnoredScope(types=['Multiply', 'Subtract', 'Sigmoid'])
+    )
+
+    os.makedirs(target, exist_ok=True)
+    ov.save_model(quantized, os.path.join(target, os.path.basename(xml)))
+    shutil.copy(os.path.join(source, 'metadata.yaml'), target)
+
+def _limit_threads(model, backend, path, threads):
+    """Recreate the export's inference session with `threads` intra-op threads.
+
+    ultralytics opens the session with the runtime's defaults (one thread per core),
+    which oversubscribes the CPU when several workers share a node.
+    """
+    # The predictor, and with it the session, is created by the first predict call
+    model.predict(Image.new('RGB', (64, 64)), verbose=False)
+    runtime = model.predictor.model
+    runtime = getattr(runtime, 'backend', runtime)
+
+    if backend == 'onnx':
+        import onnxruntime
+        options = onnxruntime.SessionOptions()
+        options.intra_op_num_threads = threads
+        options.inter_op_num_threads = 1
+        runtime.session = onnxruntime.InferenceSession(path, options, providers=['CPUExecutionProvider'])
+    else:
+        import openvino as ov
+        xml = glob.glob(os.path.join(path, '*.xml'))[0]
+        config = {'PERFORMANCE_HINT': 'LATENCY', 'INFERENCE_NUM_THREADS': threads}
+        runtime.ov_compiled_model = ov.Core().compile_model(xml, 'CPU', config)
+
+def load_yolo(weights, backend='pytorch', int8=False, threads=0, image_size=640, calibration_dir=None):
+    """Load the detector on the chosen runtime; `threads` = 0 keeps the runtime's default."""
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown YOLO backend '{backend}'; expected one of {', '.join(BACKENDS)}")
+    from ultralytics import YOLO
+
+    if backend == 'pytorch':
+        if threads:
+            import torch
+            torch.set_num_threads(threads)
+        return YOLO(weights)
+
+    path = export_model(weights, backend, int8, image_size, calibration_dir)
+    with _output_to_stderr():
+        # Loading an export logs the runtime it picked
+        model = YOLO(path, task='detect')
+        if threads:
+            _limit_threads(model, backend, path, threads)
+    return model
+
+def _labels(result):
+    return [result.names[int(cls)] for cls in result.boxes.cls.cpu().numpy()] if result.boxes is not None else []
+
+def _timed_predictions(model, images):
+    labels, latencies = [], []
+    model.predict(images[0], verbose=False)  # Warm-up
+    for image in images:
+        start = time.perf_counter()
+        result = model.predict(image, verbose=False)[0]
+        latencies.append((time.perf_counter() - start) * 1000.0)
+        labels.append(_labels(result))
+    return labels, latencies
+
+def check_parity(weights, backend, int8, directory, image_size=640, threads=0, calibration_dir=None):
+    """Compare the export's labels and latency against the PyTorch model on the images in `directory`."""
+    paths = _image_paths(directory)
+    if not paths:
+        raise ValueError(f"No images found in {directory}")
+    if int8:
+        if not calibration_dir:
+            raise ValueError("INT8 checks need a calibration directory separate from the checked images")
+        overlap = set(map(os.path.realpath, paths)) & set(map(os.path.realpath, _image_paths(calibration_dir)))
+        if overlap:
+            print(f"Warning: {len(overlap)} of the checked images were also used for calibration; "
+                  "the agreement will be optimistic", file=sys.stderr)
+    images = [prepare_image(path, image_size) for path in paths]
+
+    reference, reference_ms = _timed_predictions(load_yolo(weights, threads=threads), images)
+    exported = load_yolo(weights, backend, int8, threads, image_size, calibration_dir)
+    candidate, candidate_ms = _timed_predictions(exported, images)
+
+    mismatches = []
+    for path, expected, actual in zip(paths, reference, candidate):
+        # Same set of detected labels, and the same most confident one
+        if sorted(expected) != sorted(actual) or expected[:1] != actual[:1]:
+            mismatches.append({'path': path, 'pytorch': expected, backend: actual})
+
+    return {
+        'images': len(paths),
+        'agreement': 1.0 - len(mismatches) / len(paths),
+        'mismatches': mismatches,
+        'pytorch_ms': float(np.median(reference_ms)),
+        f"{backend}{'_int8' if int8 else ''}_ms": float(np.median(candidate_ms))
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the YOLO detector and check it against PyTorch")
+    parser.add_argument('command', choices=['export', 'check'])
+    parser.add_argument('images', nargs='?', help="sample images for 'check'")
+    parser.add_argument('--weights', default=os.environ.get('YOLO_WEIGHTS', 'best.pt'))
+    parser.add_argument('--backend', choices=['onnx', 'openvino'], default='onnx')
+    parser.add_argument('--int8', action='store_true', help='INT8-quantised export')
+    parser.add_argument('--calibration', help='sample images for INT8 calibration, held out from the checked images')
+    parser.add_argument('--image-size', type=int, default=int(os.environ.get('DETECT_IMAGE_SIZE', 640)))
+    parser.add_argument('--threads', type=int, default=0, help='inference threads for both models (0 = default)')
+    parser.add_argument('--min-agreement', type=float, default=0.98, help="fraction of images whose labels must match")
+    args = parser.parse_args()
+
+    if args.command == 'export':
+        print(export_model(args.weights, args.backend, args.int8, args.image_size, args.calibration))
+        return
+    if not args.images:
+        parser.error("check needs a directory of sample images")
+    if args.int8 and not args.calibration:
+        parser.error("INT8 checks need --calibration images separate from the checked ones")
+
+    report = check_parity(args.weights, args.backend, args.int8, args.images,
+                          args.image_size, args.threads, args.calibration)
+    for mismatch in report['mismatches']:
+        print(f"MISMATCH {mismatch}")
+    print({key: value for key, value in report.items() if key != 'mismatches'})
+    if report['agreement'] < args.min_agreement:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
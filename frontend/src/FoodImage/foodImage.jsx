@@ -13,6 +13,7 @@ const FoodImage = () => {
   const [detectedFood, setDetectedFood] = useState("");
   const [isAnalyzing, setIsAnalyzing] = useState(false);
   const [macros, setMacros] = useState(null);
+  const [plateItems, setPlateItems] = useState([]);
   const [isMenuOpen, setIsMenuOpen] = useState(false);
   const [isLoading, setIsLoading] = useState(false);
   const fileInputRef = useRef(null);
@@ -63,6 +64,7 @@ const FoodImage = () => {
   
       setDetectedFood(response.data.detected_food);
       setMacros(response.data.macros);
+      setPlateItems(response.data.items || []);
       toast.success('Analysis complete!');
       
     } catch (error) {
@@ -286,14 +288,40 @@ const FoodImage = () => {
               <div className="flex items-center gap-3 bg-green-400/10 p-4 rounded-lg">
                 <CheckCircle className="text-green-400 w-6 h-6 flex-shrink-0" />
                 <div>
-                  <p className="text-gray-300 font-medium">Detected Food:</p>
+                  <p className="text-gray-300 font-medium">{plateItems.length > 1 ? "Detected Foods:" : "Detected Food:"}</p>
                   <p className="text-green-400 text-lg font-semibold">{detectedFood}</p>
                 </div>
               </div>
 
+              {plateItems.length > 1 && (
+                <div className="bg-black/50 p-4 rounded-lg">
+                  <h3 className="text-gray-300 font-medium mb-3">On Your Plate:</h3>
+                  <ul className="space-y-2">
+                    {plateItems.map((item) => (
+                      <li key={item.label} className="flex justify-between text-sm bg-gray-800/50 p-3 rounded-lg">
+                        <span className="text-gray-300">
+                          {item.label} <span className="text-gray-500">× {item.servings} serving{item.servings === 1 ? "" : "s"}</span>
+                        </span>
+                        <span className="text-green-400">
+                          {item.calories != null ? `${Math.round(item.calories)} kcal` : "unknown"}
+                          {item.source !== "dataset" && <span className="text-gray-500"> (estimate)</span>}
+                        </span>
+                      </li>
+                    ))}
+                  </ul>
+                </div>
+              )}
+
               {macros ? (
                 <div className="bg-black/50 p-4 rounded-lg">
-                  <h3 className="text-gray-300 font-medium mb-3">Nutritional Information:</h3>
+                  <h3 className="text-gray-300 font-medium mb-3">
+                    {plateItems.length > 1 ? "Plate Total:" : "Nutritional Information:"}
+                  </h3>
+                  {macros.partial && (
+                    <p className="text-yellow-400 text-sm mb-3">
+                      Some items could not be identified, so these totals are incomplete.
+                    </p>
+                  )}
                   <div className="grid grid-cols-2 md:grid-cols-4 gap-4">
                     <div className="bg-gray-800/50 p-3 rounded-lg text-center">
                       <p className="text-gray-400 text-sm">Calories</p>